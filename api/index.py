@@ -13,6 +13,8 @@ import logging
 try:
     from config import config
     from binance_client import BinanceWithdrawalClient
+    from http_transport import get_transport
+    from client_registry import ClientRegistry
     HAS_BINANCE = True
 except ImportError:
     HAS_BINANCE = False
@@ -27,8 +29,8 @@ app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 全局变量
-binance_clients = {}
+# 全局变量 - 按X-Session-ID保存的客户端，带容量上限和空闲过期
+binance_clients = ClientRegistry() if HAS_BINANCE else None
 
 @app.route('/')
 def index():
@@ -58,7 +60,7 @@ def api_config():
             binance_client = BinanceWithdrawalClient(api_key, api_secret, testnet)
             
             if binance_client.connect():
-                binance_clients[session_id] = binance_client
+                binance_clients.put(session_id, binance_client)
                 logger.info(f"API连接成功 - Session: {session_id}")
                 
                 # 直接返回成功，不测试账户信息（避免权限问题）
@@ -87,10 +89,11 @@ def api_config():
     
     else:
         # 获取当前配置状态
-        connected = session_id in binance_clients and binance_clients[session_id].client is not None
+        binance_client = binance_clients.get(session_id)
+        connected = binance_client is not None and binance_client.client is not None
         return jsonify({
             'connected': connected,
-            'testnet': binance_clients.get(session_id, {}).testnet if connected else True
+            'testnet': binance_client.testnet if connected else True
         })
 
 @app.route('/api/account')
@@ -163,6 +166,20 @@ def api_balance(asset):
         logger.error(f"获取余额错误: {str(e)}")
         return jsonify({'success': False, 'message': f'错误: {str(e)}'})
 
+@app.route('/api/networks/<coin>')
+def api_networks(coin):
+    """获取币种支持的网络、手续费和数量限制(读取缓存的元数据)"""
+    if not HAS_BINANCE:
+        return jsonify({'success': False, 'message': 'Binance模块未正确安装'})
+        
+    session_id = request.headers.get('X-Session-ID', 'default')
+    binance_client = binance_clients.get(session_id)
+    
+    if not binance_client or not binance_client.client:
+        return jsonify({'success': False, 'message': '请先配置API'})
+    
+    return jsonify({'success': True, 'data': binance_client.get_coin_networks(coin.upper())})
+
 @app.route('/api/withdraw', methods=['POST'])
 def api_withdraw():
     """执行提币"""
@@ -268,7 +285,15 @@ def api_batch_withdraw():
             'message': f'批量提币总金额超过限额 {max_amount * 10}'
         })
 
-    # 执行批量提币
+    # 使用缓存的币种元数据预先校验，无效条目不消耗提币额度
+    valid, reason = binance_client.validate_batch(coin, network, [
+        (addr['address'], float(addr['amount']), addr.get('addressTag') or None) for addr in addresses
+    ])
+    if not valid:
+        return jsonify({'success': False, 'message': reason})
+
+    # 执行批量提币，共用一份余额快照
+    balance = binance_client.balance_snapshot(coin)
     results = []
     for addr_info in addresses:
         try:
@@ -282,7 +307,8 @@ def api_batch_withdraw():
                 address=address,
                 amount=amount,
                 network=network,
-                address_tag=address_tag
+                address_tag=address_tag,
+                balance=balance
             )
 
             results.append({
@@ -350,7 +376,20 @@ def api_smart_withdraw():
     else:
         return jsonify({'success': False, 'message': '数量配置模式错误'})
 
-    # 执行智能提币
+    # 按数量区间的上下限预先校验地址和数量
+    if amount_config['mode'] == 'random':
+        bounds = [binance_client.round_amount(coin, network, amount_config['min']),
+                  binance_client.round_amount(coin, network, amount_config['max'])]
+    else:
+        bounds = [amount_config['amount']]
+    valid, reason = binance_client.validate_batch(coin, network, [
+        (addr_info['address'], bound, addr_info.get('tag') or None) for addr_info in addresses for bound in bounds
+    ])
+    if not valid:
+        return jsonify({'success': False, 'message': reason})
+
+    # 执行智能提币，共用一份余额快照
+    balance = binance_client.balance_snapshot(coin)
     results = []
     for addr_info in addresses:
         try:
@@ -359,9 +398,9 @@ def api_smart_withdraw():
 
             # 生成提币数量
             if amount_config['mode'] == 'random':
-                amount = round(
-                    random.uniform(amount_config['min'], amount_config['max']),
-                    8
+                amount = binance_client.round_amount(
+                    coin, network,
+                    random.uniform(amount_config['min'], amount_config['max'])
                 )
             else:
                 amount = amount_config['amount']
@@ -372,7 +411,8 @@ def api_smart_withdraw():
                 address=address,
                 amount=amount,
                 network=network,
-                address_tag=address_tag
+                address_tag=address_tag,
+                balance=balance
             )
 
             results.append({
@@ -402,6 +442,20 @@ def api_smart_withdraw():
         'results': results
     })
 
+@app.route('/api/transport-stats')
+def api_transport_stats():
+    """获取共享HTTP连接池统计"""
+    if not HAS_BINANCE:
+        return jsonify({'success': False, 'message': 'Binance模块未正确安装'})
+    return jsonify({'success': True, 'data': get_transport().get_stats()})
+
+@app.route('/api/client-stats')
+def api_client_stats():
+    """获取客户端注册表统计"""
+    if not HAS_BINANCE:
+        return jsonify({'success': False, 'message': 'Binance模块未正确安装'})
+    return jsonify({'success': True, 'data': binance_clients.get_stats()})
+
 @app.route('/api/ip-info')
 def api_ip_info():
     """获取本机IP信息"""
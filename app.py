@@ -1,19 +1,31 @@
 import os
 import logging
+import signal
 import socket
 import requests
 import random
-from flask import Flask, render_template, request, jsonify, session
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, render_template, request, jsonify, session
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import json
+import csv
+import io
 from datetime import datetime
 import threading
 import time
-import uuid
 
 from config import config
 from database import DatabaseManager
 from binance_client import BinanceWithdrawalClient
+from http_transport import get_transport
+from client_registry import ClientRegistry
+from history_sync import WithdrawalHistorySync
+from reconciler import WithdrawalReconciler
+from task_runner import BatchTaskRunner
+from bounded_executor import BoundedExecutor
+from timer_scheduler import TimerScheduler
+from progress_hub import ProgressHub, task_room
+from retry_policy import generate_withdraw_order_id
+from retention import RetentionManager
 
 # 创建Flask应用
 app = Flask(__name__)
@@ -24,11 +36,18 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 
 # 初始化数据库
 db = DatabaseManager(app.config['DATABASE_PATH'])
+history_sync = WithdrawalHistorySync(db)
+retention = RetentionManager(db)
 
 # 全局变量
-binance_client = None
+clients = ClientRegistry()
 withdrawal_tasks = {}
-batch_tasks = {}
+
+# 本地版只有一个客户端，使用固定的注册表键
+DEFAULT_CLIENT_KEY = 'default'
+# 按已保存的配置重建客户端: 同一时间只重建一次，失败后在退避期内不再握手
+client_rebuild_lock = threading.Lock()
+client_rebuild = {'retry_at': 0.0}
 
 # 配置日志
 logging.basicConfig(
@@ -44,6 +63,64 @@ logger = logging.getLogger(__name__)
 # 确保日志目录存在
 os.makedirs('logs', exist_ok=True)
 
+def get_binance_client(rebuild: bool = True):
+    """
+    获取当前Binance客户端，空闲过期被释放后按已保存的配置重建
+    
+    Args:
+        rebuild: 注册表中没有客户端时是否重建(需要一次网络握手)
+    """
+    binance_client = clients.get(DEFAULT_CLIENT_KEY)
+    if binance_client is not None or not rebuild:
+        return binance_client
+    with client_rebuild_lock:
+        # 等锁期间其他请求可能已经重建完成
+        binance_client = clients.get(DEFAULT_CLIENT_KEY)
+        if binance_client is not None:
+            return binance_client
+        if time.monotonic() < client_rebuild['retry_at']:
+            return None
+        api_key = db.get_config('api_key')
+        api_secret = db.get_config('api_secret')
+        if not api_key or not api_secret:
+            return None
+        try:
+            binance_client = BinanceWithdrawalClient(api_key, api_secret, db.get_config('testnet') == 'True')
+        except Exception as e:
+            logger.error(f'使用已保存的API配置连接失败: {str(e)}')
+            client_rebuild['retry_at'] = time.monotonic() + app.config['CLIENT_REBUILD_BACKOFF']
+            return None
+        clients.put(DEFAULT_CLIENT_KEY, binance_client)
+        return binance_client
+
+# 已提交提币的状态对账
+reconciler = WithdrawalReconciler(db, get_binance_client, socketio.emit)
+
+# 后台执行器: 单笔提币和批量/智能任务分别排队，队列满时返回429
+withdraw_executor = BoundedExecutor('withdraw', app.config['WITHDRAW_WORKERS'], app.config['WITHDRAW_QUEUE_SIZE'])
+task_executor = BoundedExecutor('batch-task', app.config['TASK_WORKERS'], app.config['TASK_QUEUE_SIZE'])
+# 后台提币历史同步，同一币种已在排队或同步中时不重复提交
+history_executor = BoundedExecutor('history-sync', app.config['HISTORY_SYNC_WORKERS'],
+                                   app.config['HISTORY_SYNC_QUEUE_SIZE'])
+history_sync_pending = set()
+history_sync_lock = threading.Lock()
+
+# 批量/智能提币任务，进度只推送给订阅了该任务的客户端
+# 智能提币各步骤由定时调度器按间隔执行，等待期间不占用线程
+progress_hub = ProgressHub(socketio, db)
+scheduler = TimerScheduler(app.config['SCHEDULER_WORKERS'])
+task_runner = BatchTaskRunner(db, task_executor, scheduler, progress_hub.emit)
+
+def busy_response(executor):
+    """执行器已满时的429响应"""
+    retry_after = executor.retry_after()
+    return jsonify({
+        'success': False,
+        'message': f'当前排队任务过多，请{retry_after}秒后重试',
+        'retry_after': retry_after,
+        'queue_depth': executor.queue_depth()
+    }), 429, {'Retry-After': str(retry_after)}
+
 @app.route('/')
 def index():
     """主页"""
@@ -62,15 +139,19 @@ def api_config():
             return jsonify({'success': False, 'message': 'API Key和Secret不能为空'})
         
         # 保存配置到数据库
-        db.save_config('api_key', api_key)
-        db.save_config('api_secret', api_secret)
-        db.save_config('testnet', str(testnet))
+        db.save_configs({
+            'api_key': api_key,
+            'api_secret': api_secret,
+            'testnet': str(testnet)
+        })
+        # 新的配置不受之前重建失败的退避限制
+        client_rebuild['retry_at'] = 0.0
         
         # 初始化Binance客户端
-        global binance_client
         binance_client = BinanceWithdrawalClient(api_key, api_secret, testnet)
         
         if binance_client.connect():
+            clients.put(DEFAULT_CLIENT_KEY, binance_client)
             db.add_operation_log('API配置', f'成功连接到Binance API (测试网: {testnet})')
             socketio.emit('log_update', {
                 'type': 'success',
@@ -87,6 +168,9 @@ def api_config():
         api_key = db.get_config('api_key') or ''
         testnet = db.get_config('testnet') == 'True'
         
+        # 只查看当前状态，不为查询配置触发握手
+        binance_client = get_binance_client(rebuild=False)
+        
         # 隐藏API Key的部分字符
         masked_key = api_key[:8] + '*' * (len(api_key) - 16) + api_key[-8:] if len(api_key) > 16 else api_key
         
@@ -99,6 +183,7 @@ def api_config():
 @app.route('/api/account')
 def api_account():
     """获取账户信息"""
+    binance_client = get_binance_client()
     if not binance_client or not binance_client.client:
         return jsonify({'success': False, 'message': '请先配置API'})
     
@@ -111,6 +196,7 @@ def api_account():
 @app.route('/api/balance/<asset>')
 def api_balance(asset):
     """获取指定资产余额"""
+    binance_client = get_binance_client()
     if not binance_client or not binance_client.client:
         return jsonify({'success': False, 'message': '请先配置API'})
     
@@ -120,9 +206,26 @@ def api_balance(asset):
     else:
         return jsonify({'success': False, 'message': f'获取{asset}余额失败'})
 
+@app.route('/api/networks/<coin>')
+def api_networks(coin):
+    """获取币种支持的网络、手续费和数量限制(读取缓存的元数据)"""
+    binance_client = get_binance_client()
+    if not binance_client or not binance_client.client:
+        return jsonify({'success': False, 'message': '请先配置API'})
+    
+    networks = binance_client.get_coin_networks(coin.upper())
+    if not networks:
+        # 元数据不可用时返回预设的网络和手续费
+        networks = [
+            {'coin': coin.upper(), 'network': network, 'fee': app.config['NETWORK_FEES'].get(network)}
+            for network in app.config['SUPPORTED_COINS'].get(coin.upper(), [])
+        ]
+    return jsonify({'success': True, 'data': networks})
+
 @app.route('/api/withdraw', methods=['POST'])
 def api_withdraw():
     """执行提币"""
+    binance_client = get_binance_client()
     if not binance_client or not binance_client.client:
         return jsonify({'success': False, 'message': '请先配置API'})
     
@@ -144,15 +247,27 @@ def api_withdraw():
             'message': f'提币金额超过限额 {app.config["MAX_WITHDRAWAL_AMOUNT"]}'
         })
     
+    # 先占用执行器位置，队列已满时不记录提币请求
+    if not withdraw_executor.reserve():
+        return busy_response(withdraw_executor)
+
+    # 客户端提币ID，重试时使用同一个ID去重
+    withdraw_order_id = generate_withdraw_order_id()
+
     # 记录提币请求
-    log_id = db.add_withdrawal_log(
-        coin=coin,
-        network=network,
-        address=address,
-        amount=amount,
-        fee=0,  # 手续费稍后更新
-        status='PENDING'
-    )
+    try:
+        log_id = db.add_withdrawal_log(
+            coin=coin,
+            network=network,
+            address=address,
+            amount=amount,
+            fee=0,  # 手续费稍后更新
+            status='PENDING',
+            withdraw_order_id=withdraw_order_id
+        )
+    except Exception:
+        withdraw_executor.release()
+        raise
     
     # 异步执行提币
     def execute_withdrawal():
@@ -162,7 +277,8 @@ def api_withdraw():
                 address=address,
                 amount=amount,
                 network=network,
-                address_tag=address_tag
+                address_tag=address_tag,
+                withdraw_order_id=withdraw_order_id
             )
             
             if success:
@@ -193,10 +309,8 @@ def api_withdraw():
                 'message': error_msg
             })
     
-    # 启动后台任务
-    thread = threading.Thread(target=execute_withdrawal)
-    thread.daemon = True
-    thread.start()
+    # 放入后台执行器排队执行
+    withdraw_executor.submit_reserved(execute_withdrawal)
     
     return jsonify({
         'success': True,
@@ -207,6 +321,7 @@ def api_withdraw():
 @app.route('/api/batch-withdraw', methods=['POST'])
 def api_batch_withdraw():
     """批量提币"""
+    binance_client = get_binance_client()
     if not binance_client or not binance_client.client:
         return jsonify({'success': False, 'message': '请先配置API'})
 
@@ -214,6 +329,7 @@ def api_batch_withdraw():
     coin = data.get('coin', '').upper()
     network = data.get('network', '').upper()
     addresses = data.get('addresses', [])
+    concurrency = int(data.get('concurrency') or app.config['BATCH_CONCURRENCY'])
 
     # 验证参数
     if not all([coin, network, addresses]):
@@ -241,121 +357,24 @@ def api_batch_withdraw():
             'message': f'批量提币总金额超过限额 {app.config["MAX_WITHDRAWAL_AMOUNT"] * 10}'
         })
 
-    # 生成批量任务ID
-    task_id = str(uuid.uuid4())[:8]
-
-    # 记录批量任务
-    batch_tasks[task_id] = {
-        'total': len(addresses),
-        'completed': 0,
-        'failed': 0,
-        'status': 'PROCESSING'
-    }
-
-    # 异步执行批量提币
-    def execute_batch_withdrawal():
-        try:
-            db.add_operation_log('批量提币开始', f'任务ID: {task_id}, 总数: {len(addresses)}')
-            socketio.emit('batch_update', {
-                'task_id': task_id,
-                'status': 'PROCESSING',
-                'message': f'开始批量提币，共{len(addresses)}个地址'
-            })
-
-            for i, addr_info in enumerate(addresses):
-                try:
-                    address = addr_info['address']
-                    amount = float(addr_info['amount'])
-                    address_tag = addr_info.get('addressTag', '') or None
-
-                    # 记录单个提币
-                    log_id = db.add_withdrawal_log(
-                        coin=coin,
-                        network=network,
-                        address=address,
-                        amount=amount,
-                        fee=0,
-                        status='PENDING'
-                    )
-
-                    # 执行提币
-                    success, message, tx_id = binance_client.withdraw(
-                        coin=coin,
-                        address=address,
-                        amount=amount,
-                        network=network,
-                        address_tag=address_tag
-                    )
-
-                    if success:
-                        db.update_withdrawal_status(log_id, 'SUBMITTED', tx_id)
-                        batch_tasks[task_id]['completed'] += 1
-                        socketio.emit('batch_progress', {
-                            'task_id': task_id,
-                            'current': i + 1,
-                            'total': len(addresses),
-                            'address': address,
-                            'status': 'SUCCESS',
-                            'message': message
-                        })
-                    else:
-                        db.update_withdrawal_status(log_id, 'FAILED', error_message=message)
-                        batch_tasks[task_id]['failed'] += 1
-                        socketio.emit('batch_progress', {
-                            'task_id': task_id,
-                            'current': i + 1,
-                            'total': len(addresses),
-                            'address': address,
-                            'status': 'FAILED',
-                            'message': message
-                        })
-
-                    # 添加延迟避免API限制
-                    time.sleep(1)
-
-                except Exception as e:
-                    error_msg = f'地址 {address} 提币失败: {str(e)}'
-                    db.update_withdrawal_status(log_id, 'FAILED', error_message=error_msg)
-                    batch_tasks[task_id]['failed'] += 1
-                    socketio.emit('batch_progress', {
-                        'task_id': task_id,
-                        'current': i + 1,
-                        'total': len(addresses),
-                        'address': address,
-                        'status': 'FAILED',
-                        'message': error_msg
-                    })
-
-            # 批量任务完成
-            batch_tasks[task_id]['status'] = 'COMPLETED'
-            completed = batch_tasks[task_id]['completed']
-            failed = batch_tasks[task_id]['failed']
-
-            db.add_operation_log(
-                '批量提币完成',
-                f'任务ID: {task_id}, 成功: {completed}, 失败: {failed}'
-            )
-
-            socketio.emit('batch_complete', {
-                'task_id': task_id,
-                'completed': completed,
-                'failed': failed,
-                'message': f'批量提币完成: 成功{completed}个，失败{failed}个'
-            })
-
-        except Exception as e:
-            error_msg = f'批量提币执行异常: {str(e)}'
-            batch_tasks[task_id]['status'] = 'FAILED'
-            db.add_operation_log('批量提币错误', f'任务ID: {task_id}, 错误: {error_msg}', 'ERROR')
-            socketio.emit('batch_error', {
-                'task_id': task_id,
-                'message': error_msg
-            })
-
-    # 启动后台任务
-    thread = threading.Thread(target=execute_batch_withdrawal)
-    thread.daemon = True
-    thread.start()
+    # 使用缓存的币种元数据预先校验，无效条目不消耗提币额度
+    valid, reason = binance_client.validate_batch(coin, network, [
+        (addr['address'], float(addr['amount']), addr.get('addressTag') or None) for addr in addresses
+    ])
+    if not valid:
+        return jsonify({'success': False, 'message': reason})
+
+    # 在一个事务中登记任务和全部条目，之后按条目更新状态，进程重启后可从中断处继续
+    task_id = task_runner.submit(binance_client, 'BATCH', coin, network, [{
+        'address': addr_info['address'],
+        'address_tag': addr_info.get('addressTag') or None,
+        'amount': float(addr_info['amount']),
+        # 客户端提币ID，重试和恢复时使用同一个ID去重
+        'withdraw_order_id': generate_withdraw_order_id()
+    } for addr_info in addresses], {'concurrency': concurrency})
+    if task_id is None:
+        return busy_response(task_executor)
+    progress_hub.touch(task_id)
 
     return jsonify({
         'success': True,
@@ -366,6 +385,7 @@ def api_batch_withdraw():
 @app.route('/api/smart-withdraw', methods=['POST'])
 def api_smart_withdraw():
     """智能批量提币"""
+    binance_client = get_binance_client()
     if not binance_client or not binance_client.client:
         return jsonify({'success': False, 'message': '请先配置API'})
 
@@ -396,148 +416,48 @@ def api_smart_withdraw():
     else:
         return jsonify({'success': False, 'message': '数量配置模式错误'})
 
+    # 按数量区间的上下限预先校验地址和数量
+    if amount_config['mode'] == 'random':
+        bounds = [binance_client.round_amount(coin, network, amount_config['min']),
+                  binance_client.round_amount(coin, network, amount_config['max'])]
+    else:
+        bounds = [amount_config['amount']]
+    valid, reason = binance_client.validate_batch(coin, network, [
+        (addr_info['address'], bound, addr_info.get('tag') or None) for addr_info in addresses for bound in bounds
+    ])
+    if not valid:
+        return jsonify({'success': False, 'message': reason})
+
     # 验证时间间隔配置
     min_interval = interval_config.get('min', 1)
     max_interval = interval_config.get('max', 5)
     if min_interval < 1 or max_interval < 1 or min_interval >= max_interval:
         return jsonify({'success': False, 'message': '时间间隔设置错误'})
 
-    # 生成任务ID
-    task_id = str(uuid.uuid4())[:8]
-
-    # 记录任务
-    batch_tasks[task_id] = {
-        'total': len(addresses),
-        'completed': 0,
-        'failed': 0,
-        'status': 'PROCESSING',
-        'type': 'SMART'
-    }
-
-    # 异步执行智能提币
-    def execute_smart_withdrawal():
-        try:
-            db.add_operation_log('智能提币开始', f'任务ID: {task_id}, 总数: {len(addresses)}')
-            socketio.emit('smart_withdrawal_start', {
-                'task_id': task_id,
-                'total': len(addresses),
-                'message': f'开始智能提币，共{len(addresses)}个地址'
-            })
-
-            for i, addr_info in enumerate(addresses):
-                try:
-                    address = addr_info['address']
-                    address_tag = addr_info.get('tag', '') or None
-
-                    # 生成提币数量
-                    if amount_config['mode'] == 'random':
-                        amount = round(
-                            random.uniform(amount_config['min'], amount_config['max']),
-                            8
-                        )
-                    else:
-                        amount = amount_config['amount']
-
-                    # 记录单个提币
-                    log_id = db.add_withdrawal_log(
-                        coin=coin,
-                        network=network,
-                        address=address,
-                        amount=amount,
-                        fee=0,
-                        status='PENDING'
-                    )
-
-                    # 执行提币
-                    success, message, tx_id = binance_client.withdraw(
-                        coin=coin,
-                        address=address,
-                        amount=amount,
-                        network=network,
-                        address_tag=address_tag
-                    )
-
-                    if success:
-                        db.update_withdrawal_status(log_id, 'SUBMITTED', tx_id)
-                        batch_tasks[task_id]['completed'] += 1
-                        socketio.emit('smart_withdrawal_progress', {
-                            'task_id': task_id,
-                            'current': i + 1,
-                            'total': len(addresses),
-                            'address': address,
-                            'amount': amount,
-                            'status': 'SUCCESS',
-                            'message': message,
-                            'tx_id': tx_id
-                        })
-                    else:
-                        db.update_withdrawal_status(log_id, 'FAILED', error_message=message)
-                        batch_tasks[task_id]['failed'] += 1
-                        socketio.emit('smart_withdrawal_progress', {
-                            'task_id': task_id,
-                            'current': i + 1,
-                            'total': len(addresses),
-                            'address': address,
-                            'amount': amount,
-                            'status': 'FAILED',
-                            'message': message
-                        })
-
-                    # 如果不是最后一个地址，添加随机间隔
-                    if i < len(addresses) - 1:
-                        interval = random.randint(min_interval, max_interval)
-                        socketio.emit('smart_withdrawal_waiting', {
-                            'task_id': task_id,
-                            'next_in': interval,
-                            'message': f'等待 {interval} 秒后处理下一个地址...'
-                        })
-                        time.sleep(interval)
-
-                except Exception as e:
-                    error_msg = f'地址 {address} 提币失败: {str(e)}'
-                    if 'log_id' in locals():
-                        db.update_withdrawal_status(log_id, 'FAILED', error_message=error_msg)
-                    batch_tasks[task_id]['failed'] += 1
-                    socketio.emit('smart_withdrawal_progress', {
-                        'task_id': task_id,
-                        'current': i + 1,
-                        'total': len(addresses),
-                        'address': address,
-                        'amount': amount if 'amount' in locals() else 0,
-                        'status': 'FAILED',
-                        'message': error_msg
-                    })
-
-            # 任务完成
-            batch_tasks[task_id]['status'] = 'COMPLETED'
-            completed = batch_tasks[task_id]['completed']
-            failed = batch_tasks[task_id]['failed']
-
-            db.add_operation_log(
-                '智能提币完成',
-                f'任务ID: {task_id}, 成功: {completed}, 失败: {failed}'
+    # 预先生成全部提币数量，在一个事务中登记任务和全部条目
+    items = []
+    for addr_info in addresses:
+        if amount_config['mode'] == 'random':
+            amount = binance_client.round_amount(
+                coin, network,
+                random.uniform(amount_config['min'], amount_config['max'])
             )
-
-            socketio.emit('smart_withdrawal_complete', {
-                'task_id': task_id,
-                'completed': completed,
-                'failed': failed,
-                'message': f'智能提币完成: 成功{completed}个，失败{failed}个'
-            })
-
-        except Exception as e:
-            error_msg = f'智能提币执行异常: {str(e)}'
-            batch_tasks[task_id]['status'] = 'FAILED'
-            db.add_operation_log('智能提币错误', f'任务ID: {task_id}, 错误: {error_msg}', 'ERROR')
-            socketio.emit('smart_withdrawal_error', {
-                'task_id': task_id,
-                'message': error_msg
-            })
-
-    # 启动后台任务
-    thread = threading.Thread(target=execute_smart_withdrawal)
-    thread.daemon = True
-    thread.start()
+        else:
+            amount = amount_config['amount']
+        items.append({
+            'address': addr_info['address'],
+            'address_tag': addr_info.get('tag') or None,
+            'amount': amount,
+            # 客户端提币ID，重试和恢复时使用同一个ID去重
+            'withdraw_order_id': generate_withdraw_order_id()
+        })
+    task_id = task_runner.submit(binance_client, 'SMART', coin, network, items, {
+        'min_interval': min_interval,
+        'max_interval': max_interval
+    })
+    if task_id is None:
+        return busy_response(task_executor)
+    progress_hub.touch(task_id)
 
     return jsonify({
         'success': True,
@@ -547,17 +467,270 @@ def api_smart_withdraw():
 
 @app.route('/api/withdrawal-history')
 def api_withdrawal_history():
-    """获取提币历史"""
-    limit = request.args.get('limit', 50, type=int)
-    logs = db.get_withdrawal_logs(limit)
-    return jsonify({'success': True, 'data': logs})
+    """获取提币历史(游标分页，可按状态/币种/网络/地址/时间范围过滤)"""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), app.config['LOG_PAGE_MAX_SIZE'])
+    try:
+        logs, next_cursor = db.query_withdrawal_logs(
+            limit,
+            cursor=request.args.get('cursor') or None,
+            status=request.args.get('status') or None,
+            coin=request.args.get('coin') or None,
+            network=request.args.get('network') or None,
+            address=request.args.get('address') or None,
+            batch_id=request.args.get('batch_id') or None,
+            start_time=request.args.get('start_time') or None,
+            end_time=request.args.get('end_time') or None
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    return jsonify({'success': True, 'data': logs, 'next_cursor': next_cursor})
+
+# 导出文件的列顺序
+EXPORT_COLUMNS = [
+    'id', 'created_at', 'updated_at', 'coin', 'network', 'address', 'amount', 'fee', 'status',
+    'tx_id', 'chain_tx_id', 'withdraw_order_id', 'batch_id', 'error_message'
+]
+
+def export_csv(rows):
+    """逐块生成CSV文本"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % app.config['EXPORT_CHUNK_SIZE'] == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def export_ndjson(rows):
+    """逐行生成NDJSON文本"""
+    for row in rows:
+        yield json.dumps({column: row.get(column) for column in EXPORT_COLUMNS}, ensure_ascii=False) + '\n'
+
+@app.route('/api/withdrawal-history/export')
+def api_withdrawal_history_export():
+    """流式导出提币记录(format=csv|ndjson，过滤条件同/api/withdrawal-history)"""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'success': False, 'message': f'不支持的导出格式: {export_format}'})
+
+    rows = db.iter_withdrawal_logs(
+        app.config['EXPORT_CHUNK_SIZE'],
+        status=request.args.get('status') or None,
+        coin=request.args.get('coin') or None,
+        network=request.args.get('network') or None,
+        address=request.args.get('address') or None,
+        batch_id=request.args.get('batch_id') or None,
+        start_time=request.args.get('start_time') or None,
+        end_time=request.args.get('end_time') or None
+    )
+    if export_format == 'csv':
+        body, mimetype = export_csv(rows), 'text/csv'
+    else:
+        body, mimetype = export_ndjson(rows), 'application/x-ndjson'
+
+    filename = f"withdrawals_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/api/exchange-history')
+def api_exchange_history():
+    """获取本地同步的交易所提币历史，sync=1时在后台触发一次增量同步"""
+    coin = (request.args.get('coin') or '').upper() or None
+    limit = request.args.get('limit', 100, type=int)
+    if request.args.get('sync') == '1':
+        binance_client = get_binance_client()
+        if binance_client:
+            submit_history_sync(binance_client, coin)
+    records = db.get_exchange_withdrawals(coin, limit)
+    return jsonify({'success': True, 'data': records, 'cursor': db.get_sync_cursor(coin or '')})
+
+@app.route('/api/exchange-history/sync', methods=['POST'])
+def api_exchange_history_sync():
+    """增量同步交易所提币历史"""
+    binance_client = get_binance_client()
+    if not binance_client:
+        return jsonify({'success': False, 'message': '请先配置API'})
+
+    data = request.get_json(silent=True) or {}
+    try:
+        result = history_sync.sync(binance_client, data.get('coin') or None)
+        return jsonify({'success': True, 'data': result})
+    except Exception as e:
+        logger.error(f'同步提币历史失败: {str(e)}')
+        return jsonify({'success': False, 'message': f'同步提币历史失败: {str(e)}'})
+
+def submit_history_sync(binance_client, coin=None) -> bool:
+    """提交后台提币历史同步，该币种已在排队或同步中、或队列已满时返回False"""
+    key = (coin or '').upper()
+    with history_sync_lock:
+        if key in history_sync_pending:
+            return False
+        history_sync_pending.add(key)
+    if not history_executor.submit(run_history_sync, binance_client, coin):
+        with history_sync_lock:
+            history_sync_pending.discard(key)
+        return False
+    return True
+
+def run_history_sync(binance_client, coin=None):
+    """后台执行提币历史同步"""
+    try:
+        history_sync.sync(binance_client, coin)
+    except Exception as e:
+        logger.error(f'同步提币历史失败: {str(e)}')
+    finally:
+        with history_sync_lock:
+            history_sync_pending.discard((coin or '').upper())
 
 @app.route('/api/operation-logs')
 def api_operation_logs():
-    """获取操作日志"""
-    limit = request.args.get('limit', 100, type=int)
-    logs = db.get_operation_logs(limit)
-    return jsonify({'success': True, 'data': logs})
+    """获取操作日志(游标分页，可按状态/操作类型/时间范围过滤)"""
+    limit = min(max(request.args.get('limit', 100, type=int), 1), app.config['LOG_PAGE_MAX_SIZE'])
+    try:
+        logs, next_cursor = db.query_operation_logs(
+            limit,
+            cursor=request.args.get('cursor') or None,
+            status=request.args.get('status') or None,
+            operation=request.args.get('operation') or None,
+            start_time=request.args.get('start_time') or None,
+            end_time=request.args.get('end_time') or None
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    return jsonify({'success': True, 'data': logs, 'next_cursor': next_cursor})
+
+@app.route('/api/stats')
+def api_stats():
+    """获取提币统计(读取按天汇总的统计表)"""
+    days = min(max(request.args.get('days', 30, type=int), 1), app.config['STATS_MAX_DAYS'])
+    coin = (request.args.get('coin') or '').upper() or None
+    network = (request.args.get('network') or '').upper() or None
+    rows = db.get_daily_stats(days, coin, network)
+
+    summary = {key: sum(row[key] for row in rows)
+               for key in ('total', 'pending', 'succeeded', 'completed', 'failed', 'cancelled', 'volume', 'fees')}
+    # 已取消的条目从未提交，不计入成功率的分母
+    finished = summary['succeeded'] + summary['failed']
+    summary['success_rate'] = round(summary['succeeded'] / finished, 4) if finished else None
+    return jsonify({'success': True, 'data': {'days': rows, 'summary': summary}})
+
+@app.route('/api/retention/run', methods=['POST'])
+def api_retention_run():
+    """立即执行一次日志归档"""
+    try:
+        result = retention.run()
+    except Exception as e:
+        logger.error(f'日志归档失败: {str(e)}')
+        return jsonify({'success': False, 'message': f'日志归档失败: {str(e)}'})
+    if result.get('skipped'):
+        return jsonify({'success': False, 'message': '日志归档正在进行中'})
+    return jsonify({'success': True, 'data': result})
+
+@app.route('/api/archive/<table>')
+def api_archive(table):
+    """查询已归档的日志(按日期范围读取归档文件)"""
+    start = request.args.get('start')
+    if not start:
+        return jsonify({'success': False, 'message': '请提供开始日期'})
+    limit = min(max(request.args.get('limit', 100, type=int), 1), app.config['LOG_PAGE_MAX_SIZE'])
+    filters = {key: request.args.get(key) or None for key in ('status', 'coin', 'network', 'operation')}
+    if filters['coin']:
+        filters['coin'] = filters['coin'].upper()
+    try:
+        rows = retention.read_archive(table, start, request.args.get('end') or None, filters, limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    return jsonify({'success': True, 'data': rows})
+
+@app.route('/api/transport-stats')
+def api_transport_stats():
+    """获取共享HTTP连接池统计"""
+    return jsonify({'success': True, 'data': get_transport().get_stats()})
+
+@app.route('/api/executor-stats')
+def api_executor_stats():
+    """获取后台执行器的排队和耗时统计"""
+    return jsonify({'success': True, 'data': [withdraw_executor.get_stats(), task_executor.get_stats(),
+                                              history_executor.get_stats(),
+                                              {**scheduler.get_stats(), **task_runner.get_stats()}]})
+
+def task_etag(version: int) -> str:
+    """任务状态的ETag(进程标识-版本号)"""
+    return f'{progress_hub.epoch}-{version}'
+
+def poll_task_version(task_id=None):
+    """
+    检查客户端的If-None-Match，版本未变化且指定了wait时等待版本变化
+    
+    Returns:
+        (最新版本号, 客户端是否已有最新版本)
+    """
+    version = progress_hub.version(task_id)
+    if not request.if_none_match.contains(task_etag(version)):
+        return version, False
+    wait = min(max(request.args.get('wait', 0, type=float), 0), app.config['TASK_POLL_MAX_WAIT'])
+    if wait > 0:
+        version = progress_hub.wait_for_change(task_id, version, wait)
+    return version, request.if_none_match.contains(task_etag(version))
+
+def versioned_response(payload, version: int):
+    """带ETag的响应，payload为None时返回304"""
+    response = Response(status=304) if payload is None else jsonify(payload)
+    response.set_etag(task_etag(version))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/tasks')
+def api_tasks():
+    """获取批量任务列表(支持If-None-Match，wait=秒数时长轮询到任一任务变化)"""
+    version, unchanged = poll_task_version()
+    if unchanged:
+        return versioned_response(None, version)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), app.config['LOG_PAGE_MAX_SIZE'])
+    tasks = db.get_batch_tasks(limit, (request.args.get('status') or '').upper() or None)
+    return versioned_response({'success': True, 'data': tasks, 'version': version}, version)
+
+@app.route('/api/tasks/<task_id>')
+def api_task(task_id):
+    """获取任务进度快照(支持If-None-Match，wait=秒数时长轮询到该任务变化)"""
+    version, unchanged = poll_task_version(task_id)
+    if unchanged:
+        return versioned_response(None, version)
+    task = db.get_batch_task(task_id)
+    if task is None:
+        return jsonify({'success': False, 'message': '任务不存在'}), 404
+    return versioned_response({'success': True, 'data': task, 'version': version}, version)
+
+@app.route('/api/tasks/<task_id>/pause', methods=['POST'])
+def api_task_pause(task_id):
+    """暂停智能提币任务"""
+    success, message = task_runner.pause(task_id)
+    return jsonify({'success': success, 'message': message})
+
+@app.route('/api/tasks/<task_id>/resume', methods=['POST'])
+def api_task_resume(task_id):
+    """继续已暂停的智能提币任务"""
+    success, message = task_runner.resume_task(get_binance_client(), task_id)
+    return jsonify({'success': success, 'message': message})
+
+@app.route('/api/tasks/<task_id>/cancel', methods=['POST'])
+def api_task_cancel(task_id):
+    """取消智能提币任务"""
+    success, message = task_runner.cancel(task_id)
+    return jsonify({'success': success, 'message': message})
+
+@app.route('/api/progress-stats')
+def api_progress_stats():
+    """获取任务进度推送统计"""
+    return jsonify({'success': True, 'data': progress_hub.get_stats()})
+
+@app.route('/api/client-stats')
+def api_client_stats():
+    """获取客户端注册表统计"""
+    return jsonify({'success': True, 'data': clients.get_stats()})
 
 @app.route('/api/ip-info')
 def api_ip_info():
@@ -610,16 +783,47 @@ def handle_disconnect():
     """WebSocket断开连接"""
     logger.info('客户端已断开连接')
 
+@socketio.on('subscribe_task')
+def handle_subscribe_task(data):
+    """订阅任务进度，订阅后先收到一次当前进度"""
+    task_id = (data or {}).get('task_id')
+    if not task_id:
+        return
+    join_room(task_room(task_id))
+    snapshot = progress_hub.snapshot(task_id)
+    if snapshot:
+        emit('task_snapshot', snapshot)
+
+@socketio.on('unsubscribe_task')
+def handle_unsubscribe_task(data):
+    """取消订阅任务进度"""
+    task_id = (data or {}).get('task_id')
+    if task_id:
+        leave_room(task_room(task_id))
+
+def handle_sigterm(signum, frame):
+    """收到SIGTERM时正常退出，由atexit写完延迟写入队列中的记录"""
+    raise SystemExit(0)
+
 if __name__ == '__main__':
-    # 初始化已保存的API配置
-    api_key = db.get_config('api_key')
-    api_secret = db.get_config('api_secret')
-    testnet = db.get_config('testnet') == 'True'
+    signal.signal(signal.SIGTERM, handle_sigterm)
     
-    if api_key and api_secret:
-        binance_client = BinanceWithdrawalClient(api_key, api_secret, testnet)
-        if binance_client.connect():
+    debug = True
+    # debug模式下重载器的父进程只监视文件并启动子进程，后台任务只在实际提供服务的进程中启动，
+    # 否则中断的任务会被两个进程同时恢复并重复提交
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # 初始化已保存的API配置
+        binance_client = get_binance_client()
+        if binance_client:
             logger.info('使用已保存的API配置成功连接到Binance')
+            # 恢复进程退出时未完成的批量任务
+            task_runner.resume(binance_client)
+        
+        # 启动提币状态对账
+        reconciler.start()
+        
+        # 启动日志归档
+        retention.start()
     
     # 启动应用
-    socketio.run(app, debug=True, host='0.0.0.0', port=8888, allow_unsafe_werkzeug=True)
+    socketio.run(app, debug=debug, host='0.0.0.0', port=8888, allow_unsafe_werkzeug=True)
@@ -0,0 +1,414 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+from binance.client import AsyncClient
+from binance.exceptions import BinanceAPIException
+
+from binance_client import (TIMESTAMP_ERROR_CODE, BalanceSnapshot, ServerTimeMixin, account_error,
+                            build_withdraw_params, format_account_info, format_balance,
+                            format_deposit_address, format_withdraw_record)
+from coin_metadata import get_metadata_cache
+from config import Config
+from rate_limiter import RateLimitScheduler, classify_endpoint, get_scheduler
+from retry_policy import RetryPolicy, classify_error, generate_withdraw_order_id
+from server_clock import get_server_clock
+
+# 每个事件循环一个共享的aiohttp会话
+_sessions: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]' = weakref.WeakKeyDictionary()
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """获取当前事件循环共享的aiohttp会话(需在事件循环中调用)"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=Config.ASYNC_HTTP_LIMIT,
+            ttl_dns_cache=Config.DNS_CACHE_TTL
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[loop] = session
+    return session
+
+
+async def close_async_session():
+    """关闭当前事件循环的共享会话"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+class _AsyncManagedClient(ServerTimeMixin, AsyncClient):
+    """python-binance异步客户端，使用共享会话并经由限频调度器派发请求"""
+
+    def __init__(self, *args, scheduler: RateLimitScheduler = None,
+                 session: aiohttp.ClientSession = None, **kwargs):
+        self.scheduler = scheduler or RateLimitScheduler()
+        self._shared_session = session
+        super().__init__(*args, **kwargs)
+        self.clock = get_server_clock(self.API_TESTNET_URL if self.testnet else self.API_URL)
+
+    def _init_session(self) -> aiohttp.ClientSession:
+        return self._shared_session
+
+    async def close_connection(self):
+        # 会话由同一事件循环中的所有客户端共享，不在这里关闭
+        pass
+
+    async def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        endpoint_class, weight = classify_endpoint(uri)
+        wait = self.scheduler.reserve(endpoint_class, weight)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        kwargs = self._get_request_kwargs(method, signed, force_params, **kwargs)
+        kwargs['timeout'] = aiohttp.ClientTimeout(total=self.REQUEST_TIMEOUT)
+        # 共享会话不带默认请求头，API Key随每个请求发送
+        kwargs['headers'] = self._get_headers()
+
+        async with getattr(self.session, method)(uri, **kwargs) as response:
+            self.response = response
+            self.scheduler.observe_status(response.status, response.headers)
+            try:
+                return await self._handle_response(response)
+            except BinanceAPIException as e:
+                if e.code == TIMESTAMP_ERROR_CODE:
+                    # 同步时钟会发起阻塞请求，放到线程池中执行
+                    await asyncio.get_running_loop().run_in_executor(None, self.clock.resync)
+                raise
+
+
+class AsyncBinanceWithdrawalClient:
+    """Binance提币客户端(asyncio版本)
+
+    接口与BinanceWithdrawalClient一致，所有方法均为协程。同一事件循环中的客户端共享
+    一个aiohttp会话，与同步客户端共享限频调度器和币种元数据缓存。
+    """
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True, timeout: float = None):
+        """
+        初始化异步客户端，需要调用connect()或使用create()完成连接
+
+        Args:
+            api_key: Binance API Key
+            api_secret: Binance API Secret
+            testnet: 是否使用测试网络
+            timeout: 单次调用超时秒数
+        """
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self.timeout = timeout or Config.ASYNC_REQUEST_TIMEOUT
+        self.client = None
+        self.scheduler = get_scheduler(api_key)
+        self.metadata = get_metadata_cache(testnet)
+        self._metadata_lock = None
+        self.retry_policy = RetryPolicy()
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    async def create(cls, api_key: str, api_secret: str, testnet: bool = True,
+                     timeout: float = None) -> 'AsyncBinanceWithdrawalClient':
+        """创建并连接异步客户端"""
+        self = cls(api_key, api_secret, testnet, timeout)
+        await self.connect()
+        return self
+
+    async def _call(self, awaitable: Awaitable) -> Any:
+        """带超时执行一次接口调用，超时或被取消时请求随之取消"""
+        return await asyncio.wait_for(awaitable, self.timeout)
+
+    async def connect(self) -> bool:
+        """连接到Binance API"""
+        try:
+            if self.client is None:
+                self.client = _AsyncManagedClient(
+                    api_key=self.api_key,
+                    api_secret=self.api_secret,
+                    testnet=self.testnet,
+                    loop=asyncio.get_running_loop(),
+                    scheduler=self.scheduler,
+                    session=get_async_session()
+                )
+                self._metadata_lock = asyncio.Lock()
+            # 测试连接 - 获取服务器时间，同时作为共享服务器时钟的一次采样
+            sent_at = time.time() * 1000
+            server_time = (await self._call(self.client.get_server_time()))['serverTime']
+            self.client.clock.observe(server_time, sent_at, time.time() * 1000)
+            self.logger.info(f"成功连接到Binance API (异步, 测试网: {self.testnet})")
+            return True
+        except BinanceAPIException as e:
+            self.logger.error(f"Binance API错误: {e.code} - {e.message}")
+            self.client = None
+            raise
+        except Exception as e:
+            self.logger.error(f"连接Binance API失败: {str(e)}")
+            self.client = None
+            raise
+
+    async def get_account_info(self) -> Optional[Dict]:
+        """获取账户信息"""
+        if not self.client:
+            return None
+
+        try:
+            result = format_account_info(await self._call(self.client.get_account()))
+            if not result.get('can_withdraw'):
+                self.logger.warning("账户没有提现权限")
+            return result
+        except BinanceAPIException as e:
+            self.logger.error(f"Binance API错误: {e.code} - {e.message}")
+            error = account_error(e)
+            if error is e:
+                raise
+            raise error
+        except Exception as e:
+            self.logger.error(f"获取账户信息失败: {str(e)}")
+            raise
+
+    async def get_balance(self, asset: str) -> Optional[Dict]:
+        """获取指定资产余额"""
+        if not self.client:
+            return None
+
+        try:
+            balance = await self._call(self.client.get_asset_balance(asset=asset))
+            return format_balance(balance) if balance else None
+        except Exception as e:
+            self.logger.error(f"获取{asset}余额失败: {str(e)}")
+            return None
+
+    async def get_deposit_address(self, coin: str, network: str = None) -> Optional[Dict]:
+        """获取充值地址"""
+        if not self.client:
+            return None
+
+        try:
+            result = await self._call(self.client.get_deposit_address(coin=coin, network=network))
+            return format_deposit_address(result)
+        except Exception as e:
+            self.logger.error(f"获取{coin}充值地址失败: {str(e)}")
+            return None
+
+    async def refresh_metadata(self):
+        """确保币种元数据可用"""
+        if not self.client or not self.metadata.needs_refresh():
+            return
+        # 同一客户端的并发协程只发起一次加载
+        async with self._metadata_lock:
+            if not self.metadata.needs_refresh():
+                return
+            try:
+                coins = await self._call(self.client.get_all_coins_info())
+            except Exception as e:
+                self.logger.error(f"获取币种元数据失败: {str(e)}")
+                coins = None
+            self.metadata.refresh(lambda: coins)
+
+    async def balance_snapshot(self, coin: str) -> BalanceSnapshot:
+        """创建批量任务使用的余额快照"""
+        snapshot = BalanceSnapshot(coin, None)
+        await self._sync_balance(snapshot)
+        return snapshot
+
+    async def _sync_balance(self, snapshot: BalanceSnapshot, token: int = None):
+        balance = await self.get_balance(snapshot.coin)
+        snapshot.update(balance['free'] if balance else None, token)
+
+    async def withdraw(self, coin: str, address: str, amount: float,
+                       network: str = None, address_tag: str = None,
+                       balance: BalanceSnapshot = None,
+                       withdraw_order_id: str = None) -> Tuple[bool, str, Optional[str]]:
+        """
+        执行提币操作，临时故障按退避策略重试(与同步客户端相同)
+
+        Returns:
+            (成功状态, 消息, 交易ID)
+        """
+        if not self.client:
+            return False, "未连接到Binance API", None
+
+        await self.refresh_metadata()
+        valid, reason = self.metadata.validate(coin, network, address, amount, address_tag)
+        if not valid:
+            return False, reason, None
+
+        if balance is not None:
+            token = balance.begin_sync()
+            if token is not None:
+                await self._sync_balance(balance, token)
+            reserved, available = balance.reserve(amount)
+            if not reserved:
+                if available is None:
+                    return False, f"获取{coin}余额失败", None
+                return False, f"余额不足，当前可用余额: {available}", None
+
+        try:
+            if balance is None:
+                current = await self.get_balance(coin)
+                if not current or current['free'] < amount:
+                    return False, f"余额不足，当前可用余额: {current['free'] if current else 0}", None
+
+            withdraw_order_id = withdraw_order_id or generate_withdraw_order_id()
+            withdraw_params = build_withdraw_params(coin, address, amount, network, address_tag, withdraw_order_id)
+            success, message, tx_id = await self._submit_withdrawal(withdraw_params)
+
+            if success:
+                self.logger.info(f"提币成功: {coin} {amount} -> {address}, 交易ID: {tx_id}")
+                if balance is not None:
+                    balance.commit(amount)
+            else:
+                self.logger.error(message)
+                if balance is not None:
+                    balance.release(amount)
+            return success, message, tx_id
+
+        except asyncio.CancelledError:
+            if balance is not None:
+                balance.release(amount)
+            raise
+
+        except Exception as e:
+            error_msg = f"提币失败: {str(e) or type(e).__name__}"
+            self.logger.error(error_msg)
+            if balance is not None:
+                balance.release(amount)
+            return False, error_msg, None
+
+    async def _submit_withdrawal(self, withdraw_params: Dict) -> Tuple[bool, str, Optional[str]]:
+        """提交提币请求，临时故障时退避重试"""
+        withdraw_order_id = withdraw_params['withdrawOrderId']
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await self._call(self.client.withdraw(**withdraw_params))
+                return True, "提币请求已提交", result.get('id')
+            except Exception as e:
+                retryable, ambiguous, retry_after = classify_error(e)
+                if isinstance(e, aiohttp.ClientConnectorError):
+                    # 连接未建立，请求一定没有发出
+                    retryable, ambiguous = True, False
+                elif isinstance(e, (asyncio.TimeoutError, aiohttp.ClientConnectionError)):
+                    # 超时或连接中断的请求可能已被执行
+                    retryable, ambiguous = True, True
+                if isinstance(e, BinanceAPIException):
+                    error_msg = f"Binance API错误: {e.message} (代码: {e.code})"
+                else:
+                    error_msg = f"提币失败: {str(e) or type(e).__name__}"
+                if not retryable:
+                    return False, error_msg, None
+
+                if ambiguous:
+                    try:
+                        existing = await self.find_withdrawal(withdraw_order_id)
+                    except Exception as lookup_error:
+                        self.logger.error(f"查询提币{withdraw_order_id}失败: {str(lookup_error)}")
+                        return False, f"提币结果未知，请核对提币历史 (withdrawOrderId: {withdraw_order_id})", None
+                    if existing:
+                        return True, "提币请求已提交", existing.get('id')
+
+                if attempt >= self.retry_policy.max_attempts:
+                    return False, f"{error_msg}，已重试{attempt - 1}次", None
+                delay = self.retry_policy.backoff(attempt, retry_after)
+                self.logger.warning(f"{error_msg}，{delay:.1f}秒后第{attempt}次重试 (withdrawOrderId: {withdraw_order_id})")
+                await asyncio.sleep(delay)
+
+    async def find_withdrawal(self, withdraw_order_id: str) -> Optional[Dict]:
+        """按客户端提币ID查询提币记录，不存在时返回None，查询失败时抛出异常"""
+        history = await self._call(self.client.get_withdraw_history(withdrawOrderId=withdraw_order_id))
+        for item in history:
+            if item.get('withdrawOrderId') == withdraw_order_id:
+                return item
+        return None
+
+    async def get_withdraw_history(self, coin: str = None, limit: int = 100) -> Optional[List[Dict]]:
+        """获取提币历史"""
+        if not self.client:
+            return None
+
+        try:
+            params = {'limit': limit}
+            if coin:
+                params['coin'] = coin
+            history = await self._call(self.client.get_withdraw_history(**params))
+            return [format_withdraw_record(item) for item in history]
+        except Exception as e:
+            self.logger.error(f"获取提币历史失败: {str(e)}")
+            return None
+
+
+async def bounded_gather(awaitables: Iterable[Awaitable], limit: int = None) -> List[Any]:
+    """并发执行多个协程，同时进行中的数量不超过limit，结果按输入顺序返回(异常作为结果返回)"""
+    semaphore = asyncio.Semaphore(limit or Config.ASYNC_MAX_IN_FLIGHT)
+
+    async def run(awaitable: Awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run(a) for a in awaitables), return_exceptions=True)
+
+
+class AsyncBridge:
+    """同步代码与asyncio之间的适配器
+
+    在专用线程中运行一个事件循环，Flask路由和批量任务可以从任意线程提交协程，
+    数百个进行中的请求只占用这一个线程。
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='async-bridge')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, awaitable: Awaitable) -> Future:
+        """提交协程，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(awaitable, self.loop)
+
+    def run(self, awaitable: Awaitable, timeout: float = None) -> Any:
+        """提交协程并阻塞等待结果，超时后取消协程"""
+        future = self.submit(awaitable)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def create_client(self, api_key: str, api_secret: str, testnet: bool = True) -> AsyncBinanceWithdrawalClient:
+        """在桥接事件循环中创建并连接异步客户端"""
+        return self.run(AsyncBinanceWithdrawalClient.create(api_key, api_secret, testnet))
+
+    def gather(self, awaitables: Iterable[Awaitable], limit: int = None, timeout: float = None) -> List[Any]:
+        """在桥接事件循环中并发执行一组协程并等待全部完成"""
+        return self.run(bounded_gather(list(awaitables), limit), timeout)
+
+    def shutdown(self):
+        """关闭共享会话并停止事件循环"""
+        if self.loop.is_running():
+            self.run(close_async_session())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+
+
+_bridge: Optional[AsyncBridge] = None
+_bridge_lock = threading.Lock()
+
+
+def get_bridge() -> AsyncBridge:
+    """获取进程级共享的异步适配器"""
+    global _bridge
+    with _bridge_lock:
+        if _bridge is None:
+            _bridge = AsyncBridge()
+        return _bridge
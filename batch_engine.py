@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import Config
+
+# 进程级的网络并发上限，多个批量任务同时提币到同一网络时共享
+_network_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_network_semaphores_lock = threading.Lock()
+
+
+def get_network_semaphore(network: str) -> threading.BoundedSemaphore:
+    """获取网络对应的并发信号量，上限只取自配置，与先使用该网络的任务的并发数无关"""
+    with _network_semaphores_lock:
+        semaphore = _network_semaphores.get(network)
+        if semaphore is None:
+            limit = Config.BATCH_NETWORK_CONCURRENCY.get(network, Config.BATCH_MAX_CONCURRENCY)
+            semaphore = threading.BoundedSemaphore(max(1, limit))
+            _network_semaphores[network] = semaphore
+        return semaphore
+
+
+class OrderedResults:
+    """按条目顺序回调结果: 只回调从下一个待回调序号开始连续完成的条目"""
+
+    def __init__(self, items: List[Any], on_result: Callable[[int, Any, Any, Optional[Exception]], None],
+                 logger: logging.Logger):
+        self.items = items
+        self.on_result = on_result
+        self.logger = logger
+        self._ready: Dict[int, tuple] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def deliver(self, index: int, result: Any, error: Optional[Exception]):
+        with self._lock:
+            self._ready[index] = (result, error)
+            while self._next in self._ready:
+                i = self._next
+                result, error = self._ready.pop(i)
+                try:
+                    self.on_result(i, self.items[i], result, error)
+                except Exception as e:
+                    self.logger.error(f"批量结果回调失败 (第{i + 1}项): {str(e)}")
+                self._next += 1
+
+
+class BatchWithdrawalEngine:
+    """批量提币执行引擎
+
+    使用固定大小的线程池并发提交，同时按网络限制并发数。
+    每个条目的结果按原始顺序回调，保证进度事件和计数器的顺序与条目一致。
+    """
+
+    def __init__(self, concurrency: int = None):
+        self.concurrency = max(1, min(concurrency or Config.BATCH_CONCURRENCY, Config.BATCH_MAX_CONCURRENCY))
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, items: List[Any], submit: Callable[[int, Any], Any],
+            on_result: Callable[[int, Any, Any, Optional[Exception]], None],
+            network: str = None):
+        """
+        执行批量任务，全部条目处理完毕后返回
+
+        Args:
+            items: 待处理条目
+            submit: 处理单个条目的函数 submit(index, item) -> result
+            on_result: 结果回调 on_result(index, item, result, error)，按条目顺序串行调用
+            network: 提币网络，用于共享网络并发上限
+        """
+        semaphore = get_network_semaphore(network) if network else None
+        results = OrderedResults(items, on_result, self.logger)
+
+        def worker(index: int):
+            try:
+                if semaphore:
+                    with semaphore:
+                        result = submit(index, items[index])
+                else:
+                    result = submit(index, items[index])
+            except Exception as e:
+                self.logger.error(f"批量条目执行异常 (第{index + 1}项): {str(e)}")
+                results.deliver(index, None, e)
+            else:
+                results.deliver(index, result, None)
+
+        workers = min(self.concurrency, len(items)) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-withdraw') as executor:
+            for index in range(len(items)):
+                executor.submit(worker, index)
+
+
+class AsyncBatchWithdrawalEngine(BatchWithdrawalEngine):
+    """批量提币执行引擎(asyncio版本)
+
+    条目作为协程在异步适配器的事件循环中并发执行，进行中的请求不占用线程；
+    并发数、网络并发上限和按顺序回调与线程池版本相同。
+    """
+
+    def run(self, items: List[Any], submit: Callable[[int, Any], Awaitable],
+            on_result: Callable[[int, Any, Any, Optional[Exception]], None],
+            network: str = None, bridge=None):
+        """
+        执行批量任务，全部条目处理完毕后返回，参数同BatchWithdrawalEngine.run
+
+        Args:
+            submit: 处理单个条目的协程函数 submit(index, item) -> result
+            bridge: 执行协程的AsyncBridge
+        """
+        bridge.run(self._run(items, submit, on_result, network))
+
+    async def _run(self, items: List[Any], submit: Callable[[int, Any], Awaitable],
+                   on_result: Callable[[int, Any, Any, Optional[Exception]], None], network: str = None):
+        network_semaphore = get_network_semaphore(network) if network else None
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = OrderedResults(items, on_result, self.logger)
+
+        async def worker(index: int):
+            async with semaphore:
+                if network_semaphore:
+                    # 网络并发上限与线程池版本共享，不阻塞事件循环，轮询等待空位
+                    while not network_semaphore.acquire(blocking=False):
+                        await asyncio.sleep(Config.BATCH_ASYNC_POLL_INTERVAL)
+                try:
+                    result = await submit(index, items[index])
+                except Exception as e:
+                    self.logger.error(f"批量条目执行异常 (第{index + 1}项): {str(e)}")
+                    results.deliver(index, None, e)
+                else:
+                    results.deliver(index, result, None)
+                finally:
+                    if network_semaphore:
+                        network_semaphore.release()
+
+        await asyncio.gather(*(worker(index) for index in range(len(items))))
@@ -1,9 +1,311 @@
+import hashlib
 import logging
-from typing import Dict, List, Optional, Tuple
-from binance.client import Client
+import threading
+import requests
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, List, Optional, Tuple
+from binance.client import BaseClient, Client
 from binance.exceptions import BinanceAPIException, BinanceOrderException
 import time
 
+from coin_metadata import get_metadata_cache
+from config import Config
+from http_transport import get_transport
+from rate_limiter import RateLimitScheduler, classify_endpoint, get_scheduler
+from retry_policy import RetryPolicy, classify_error, generate_withdraw_order_id
+from server_clock import ServerClock, get_server_clock
+
+
+# 这些错误码说明凭据或签名失效，需要重新握手
+CONNECTION_ERROR_CODES = (-1022, -2014, -2015)
+# 时间戳超出recvWindow
+TIMESTAMP_ERROR_CODE = -1021
+
+
+class ConnectionHealthCache:
+    """连接健康状态缓存
+
+    同一组凭据在有效期内只需握手一次；请求出现网络错误或凭据错误时立即失效。
+    """
+
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl or Config.CONNECTION_HEALTH_TTL
+        self._entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(api_key: str, api_secret: str, testnet: bool) -> str:
+        """根据凭据生成缓存键(不直接保存密钥)"""
+        return hashlib.sha256(f"{api_key}:{api_secret}:{testnet}".encode('utf-8')).hexdigest()
+
+    def is_healthy(self, key: str) -> bool:
+        with self._lock:
+            checked_at = self._entries.get(key)
+            return checked_at is not None and time.monotonic() - checked_at <= self.ttl
+
+    def mark_healthy(self, key: str):
+        with self._lock:
+            self._entries[key] = time.monotonic()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_connection_health = ConnectionHealthCache()
+
+
+class ServerTimeMixin:
+    """签名请求使用共享服务器时钟估算的时间戳和自适应recvWindow"""
+
+    clock: ServerClock = None
+
+    def _get_request_kwargs(self, method, signed: bool, force_params: bool = False, **kwargs) -> Dict:
+        if signed and self.clock is not None:
+            self.timestamp_offset = self.clock.offset
+            data = kwargs.get('data')
+            if isinstance(data, dict) and 'recvWindow' not in data:
+                data['recvWindow'] = self.clock.recv_window()
+        return super()._get_request_kwargs(method, signed, force_params, **kwargs)
+
+    def _check_timestamp_error(self, e: BinanceAPIException):
+        if e.code == TIMESTAMP_ERROR_CODE and self.clock is not None:
+            self.clock.resync()
+
+
+class _ManagedClient(ServerTimeMixin, Client):
+    """python-binance客户端，所有请求经由限频调度器派发，并使用进程级共享连接池"""
+
+    def __init__(self, *args, scheduler: RateLimitScheduler = None, health_key: str = None, **kwargs):
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.health_key = health_key
+        # 跳过Client构造函数中隐式的ping，连接测试统一由connect()负责
+        BaseClient.__init__(self, *args, **kwargs)
+        self.clock = get_server_clock(self.API_TESTNET_URL if self.testnet else self.API_URL)
+
+    def _init_session(self) -> requests.Session:
+        return get_transport().create_session(self._get_headers())
+
+    def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        endpoint_class, weight = classify_endpoint(uri)
+        self.scheduler.acquire(endpoint_class, weight)
+
+        kwargs = self._get_request_kwargs(method, signed, force_params, **kwargs)
+        try:
+            response = getattr(self.session, method)(uri, **kwargs)
+        except requests.RequestException:
+            self._invalidate_health()
+            raise
+        self.response = response
+        self.scheduler.observe(response)
+        if response.status_code >= 500:
+            self._invalidate_health()
+        try:
+            return self._handle_response(response)
+        except BinanceAPIException as e:
+            if e.code in CONNECTION_ERROR_CODES:
+                self._invalidate_health()
+            self._check_timestamp_error(e)
+            raise
+
+    def _invalidate_health(self):
+        if self.health_key:
+            _connection_health.invalidate(self.health_key)
+
+
+def format_account_info(account_info: Dict) -> Dict:
+    """整理账户信息，只保留有余额的资产"""
+    return {
+        'account_type': account_info.get('accountType'),
+        'can_trade': account_info.get('canTrade'),
+        'can_withdraw': account_info.get('canWithdraw'),
+        'can_deposit': account_info.get('canDeposit'),
+        'balances': [
+            {
+                'asset': balance['asset'],
+                'free': float(balance['free']),
+                'locked': float(balance['locked'])
+            }
+            for balance in account_info['balances']
+            if float(balance['free']) > 0 or float(balance['locked']) > 0
+        ]
+    }
+
+
+def account_error(e: BinanceAPIException) -> Exception:
+    """把账户接口的常见错误码转换为可读的错误"""
+    if e.code == -2008:
+        return Exception("API权限不足，请检查是否已开启'允许提现'权限")
+    elif e.code == -2015:
+        return Exception("API无效或IP未在白名单中")
+    elif e.code == -1022:
+        return Exception("签名无效，请检查API Secret")
+    return e
+
+
+def format_balance(balance: Dict) -> Dict:
+    """整理单个资产余额"""
+    return {
+        'asset': balance['asset'],
+        'free': float(balance['free']),
+        'locked': float(balance['locked'])
+    }
+
+
+def format_deposit_address(result: Dict) -> Dict:
+    """整理充值地址"""
+    return {
+        'address': result.get('address'),
+        'tag': result.get('tag'),
+        'coin': result.get('coin'),
+        'network': result.get('network')
+    }
+
+
+def format_withdraw_record(item: Dict) -> Dict:
+    """整理单条提币历史记录"""
+    return {
+        'id': item.get('id'),
+        'coin': item.get('coin'),
+        'network': item.get('network'),
+        'address': item.get('address'),
+        'amount': float(item.get('amount', 0)),
+        'fee': float(item.get('transactionFee', 0)),
+        'status': item.get('status'),
+        'tx_id': item.get('txId'),
+        'apply_time': item.get('applyTime'),
+        'complete_time': item.get('completeTime')
+    }
+
+
+def build_withdraw_params(coin: str, address: str, amount: float,
+                          network: str = None, address_tag: str = None,
+                          withdraw_order_id: str = None) -> Dict:
+    """组装提币接口参数"""
+    withdraw_params = {
+        'coin': coin,
+        'address': address,
+        'amount': amount
+    }
+    
+    if network:
+        withdraw_params['network'] = network
+    if address_tag:
+        withdraw_params['addressTag'] = address_tag
+    if withdraw_order_id:
+        withdraw_params['withdrawOrderId'] = withdraw_order_id
+    return withdraw_params
+
+
+class BalanceSnapshot:
+    """批量任务范围内的余额快照
+
+    批量开始时获取一次账户余额，之后提币前在本地预留、成功后本地扣减，
+    只有在提币失败或快照过期时才重新同步。余额不足的条目直接失败，不再请求交易所。
+
+    进行中的提币可能已被交易所扣减，同步到的余额与本地预留会重复扣减，因此只在没有
+    进行中的提币时同步；需要同步但仍有提币进行中时，继续使用本地余额。
+    """
+
+    def __init__(self, coin: str, fetch: Optional[Callable[[], Optional[float]]], max_age: float = None):
+        """
+        Args:
+            coin: 币种
+            fetch: 查询当前可用余额的函数，失败时返回None；为None时由调用方通过begin_sync()/update()同步
+            max_age: 快照最长有效秒数，超过后重新同步
+        """
+        self.coin = coin
+        self.max_age = max_age or Config.BALANCE_SNAPSHOT_MAX_AGE
+        self.free = None
+        self.reserved = 0.0
+        self.in_flight = 0
+        self.synced_at = 0.0
+        self.stale = True
+        self.syncs = 0
+        # 每次预留递增，外部同步期间有新的预留时丢弃同步结果
+        self._version = 0
+        self._fetch = fetch
+        self._lock = threading.Lock()
+    
+    def needs_sync(self) -> bool:
+        """快照是否需要重新同步"""
+        return self.stale or time.monotonic() - self.synced_at > self.max_age
+    
+    def _can_sync(self) -> bool:
+        return self.in_flight == 0 and self.needs_sync()
+    
+    def begin_sync(self) -> Optional[int]:
+        """
+        开始一次外部同步(异步客户端使用)
+        
+        Returns:
+            同步令牌，传给update()；不需要同步或有提币进行中时返回None
+        """
+        with self._lock:
+            return self._version if self._can_sync() else None
+    
+    def update(self, free: Optional[float], token: int = None) -> bool:
+        """
+        使用外部查询到的可用余额更新快照(异步客户端使用)
+        
+        Args:
+            free: 可用余额
+            token: begin_sync()返回的令牌，查询期间有新的预留时不更新
+            
+        Returns:
+            是否已更新
+        """
+        with self._lock:
+            if token is not None and token != self._version:
+                return False
+            self._apply(free)
+            return True
+    
+    def _apply(self, free: Optional[float]):
+        self.syncs += 1
+        self.free = free
+        self.synced_at = time.monotonic()
+        self.stale = free is None
+    
+    def reserve(self, amount: float) -> Tuple[bool, Optional[float]]:
+        """
+        为一笔提币预留余额
+        
+        Returns:
+            (是否预留成功, 当前可用余额; 无法获取余额时为None)
+        """
+        with self._lock:
+            if self._fetch is not None and self._can_sync():
+                self._apply(self._fetch())
+            if self.free is None:
+                return False, None
+            available = self.free - self.reserved
+            if available < amount:
+                return False, available
+            self.reserved += amount
+            self.in_flight += 1
+            self._version += 1
+            return True, available
+    
+    def _settle(self, amount: float):
+        self.in_flight = max(0, self.in_flight - 1)
+        # 没有进行中的提币时清零，避免浮点误差累积
+        self.reserved = max(0.0, self.reserved - amount) if self.in_flight else 0.0
+    
+    def commit(self, amount: float):
+        """提币成功，本地扣减余额"""
+        with self._lock:
+            self._settle(amount)
+            if self.free is not None:
+                self.free -= amount
+    
+    def release(self, amount: float):
+        """提币失败，释放预留并在下次可以同步时重新同步"""
+        with self._lock:
+            self._settle(amount)
+            self.stale = True
+
+
 class BinanceWithdrawalClient:
     """Binance提币客户端封装类"""
     
@@ -20,33 +322,53 @@ class BinanceWithdrawalClient:
         self.api_secret = api_secret
         self.testnet = testnet
         self.client = None
+        self.scheduler = get_scheduler(api_key)
+        self.metadata = get_metadata_cache(testnet)
+        self.retry_policy = RetryPolicy()
         self.logger = logging.getLogger(__name__)
         
         if api_key and api_secret:
             self.connect()
     
     def connect(self) -> bool:
-        """连接到Binance API"""
+        """
+        连接到Binance API
+        
+        同一组凭据在健康缓存有效期内只握手一次，之后的调用直接返回缓存结果，
+        直到缓存过期或有请求失败。
+        """
+        health_key = ConnectionHealthCache.make_key(self.api_key, self.api_secret, self.testnet)
+        if self.client is not None and _connection_health.is_healthy(health_key):
+            return True
+        
         try:
-            self.client = Client(
-                api_key=self.api_key,
-                api_secret=self.api_secret,
-                testnet=self.testnet
-            )
+            if self.client is None:
+                self.client = _ManagedClient(
+                    api_key=self.api_key,
+                    api_secret=self.api_secret,
+                    testnet=self.testnet,
+                    scheduler=self.scheduler,
+                    health_key=health_key
+                )
+            if _connection_health.is_healthy(health_key):
+                return True
             
-            # 测试连接 - 使用更简单的ping测试
+            # 测试连接 - 获取服务器时间，同时作为服务器时钟的一次采样(多次采样由后台刷新线程完成)
             try:
-                self.client.ping()
+                if not self.client.clock.sync(lambda: self.client.get_server_time()['serverTime'], samples=1):
+                    raise Exception("获取服务器时间失败")
+                _connection_health.mark_healthy(health_key)
                 self.logger.info(f"成功连接到Binance API (测试网: {self.testnet})")
                 return True
-            except Exception as ping_error:
-                # 如果ping失败，尝试获取服务器时间
+            except Exception as time_error:
+                # 如果获取服务器时间失败，尝试ping
                 try:
-                    self.client.get_server_time()
+                    self.client.ping()
+                    _connection_health.mark_healthy(health_key)
                     self.logger.info(f"成功连接到Binance API (测试网: {self.testnet})")
                     return True
-                except Exception as time_error:
-                    self.logger.error(f"API连接测试失败: ping={str(ping_error)}, time={str(time_error)}")
+                except Exception as ping_error:
+                    self.logger.error(f"API连接测试失败: time={str(time_error)}, ping={str(ping_error)}")
                     raise
             
         except BinanceAPIException as e:
@@ -68,22 +390,7 @@ class BinanceWithdrawalClient:
             if self.testnet:
                 self.logger.info("使用测试网模式获取账户信息")
                 
-            account_info = self.client.get_account()
-            result = {
-                'account_type': account_info.get('accountType'),
-                'can_trade': account_info.get('canTrade'),
-                'can_withdraw': account_info.get('canWithdraw'),
-                'can_deposit': account_info.get('canDeposit'),
-                'balances': [
-                    {
-                        'asset': balance['asset'],
-                        'free': float(balance['free']),
-                        'locked': float(balance['locked'])
-                    }
-                    for balance in account_info['balances']
-                    if float(balance['free']) > 0 or float(balance['locked']) > 0
-                ]
-            }
+            result = format_account_info(self.client.get_account())
             
             # 检查提现权限
             if not result.get('can_withdraw'):
@@ -93,13 +400,10 @@ class BinanceWithdrawalClient:
             
         except BinanceAPIException as e:
             self.logger.error(f"Binance API错误: {e.code} - {e.message}")
-            if e.code == -2008:
-                raise Exception("API权限不足，请检查是否已开启'允许提现'权限")
-            elif e.code == -2015:
-                raise Exception("API无效或IP未在白名单中")
-            elif e.code == -1022:
-                raise Exception("签名无效，请检查API Secret")
-            raise
+            error = account_error(e)
+            if error is e:
+                raise
+            raise error
         except Exception as e:
             self.logger.error(f"获取账户信息失败: {str(e)}")
             raise
@@ -111,13 +415,7 @@ class BinanceWithdrawalClient:
             
         try:
             balance = self.client.get_asset_balance(asset=asset)
-            if balance:
-                return {
-                    'asset': balance['asset'],
-                    'free': float(balance['free']),
-                    'locked': float(balance['locked'])
-                }
-            return None
+            return format_balance(balance) if balance else None
         except Exception as e:
             self.logger.error(f"获取{asset}余额失败: {str(e)}")
             return None
@@ -129,69 +427,126 @@ class BinanceWithdrawalClient:
             
         try:
             result = self.client.get_deposit_address(coin=coin, network=network)
-            return {
-                'address': result.get('address'),
-                'tag': result.get('tag'),
-                'coin': result.get('coin'),
-                'network': result.get('network')
-            }
+            return format_deposit_address(result)
         except Exception as e:
             self.logger.error(f"获取{coin}充值地址失败: {str(e)}")
             return None
     
+    def balance_snapshot(self, coin: str) -> 'BalanceSnapshot':
+        """创建批量任务使用的余额快照"""
+        def fetch() -> Optional[float]:
+            balance = self.get_balance(coin)
+            return balance['free'] if balance else None
+        return BalanceSnapshot(coin, fetch)
+    
     def withdraw(self, coin: str, address: str, amount: float, 
-                network: str = None, address_tag: str = None) -> Tuple[bool, str, Optional[str]]:
+                network: str = None, address_tag: str = None,
+                balance: 'BalanceSnapshot' = None,
+                withdraw_order_id: str = None) -> Tuple[bool, str, Optional[str]]:
         """
         执行提币操作
         
+        限频、服务端错误、时间戳错误等临时故障按退避策略自动重试。每笔提币带有客户端生成的
+        withdrawOrderId，请求可能已被执行时先按该ID查询，确认未执行才重试，不会重复提币。
+        
         Args:
             coin: 币种
             address: 提币地址
             amount: 提币数量
             network: 网络类型
             address_tag: 地址标签(如果需要)
+            balance: 批量任务的余额快照，提供时不再逐笔查询余额
+            withdraw_order_id: 客户端提币ID，为空时自动生成
             
         Returns:
             (成功状态, 消息, 交易ID)
         """
         if not self.client:
             return False, "未连接到Binance API", None
+        
+        # 先用缓存的元数据校验，不合法的条目不消耗提币额度
+        valid, reason = self.validate_withdrawal(coin, network, address, amount, address_tag)
+        if not valid:
+            return False, reason, None
+        
+        if balance is not None:
+            reserved, available = balance.reserve(amount)
+            if not reserved:
+                if available is None:
+                    return False, f"获取{coin}余额失败", None
+                return False, f"余额不足，当前可用余额: {available}", None
             
         try:
             # 检查余额
-            balance = self.get_balance(coin)
-            if not balance or balance['free'] < amount:
-                return False, f"余额不足，当前可用余额: {balance['free'] if balance else 0}", None
+            if balance is None:
+                current = self.get_balance(coin)
+                if not current or current['free'] < amount:
+                    return False, f"余额不足，当前可用余额: {current['free'] if current else 0}", None
             
             # 执行提币
-            withdraw_params = {
-                'coin': coin,
-                'address': address,
-                'amount': amount
-            }
-            
-            if network:
-                withdraw_params['network'] = network
-            if address_tag:
-                withdraw_params['addressTag'] = address_tag
-                
-            result = self.client.withdraw(**withdraw_params)
+            withdraw_order_id = withdraw_order_id or generate_withdraw_order_id()
+            withdraw_params = build_withdraw_params(coin, address, amount, network, address_tag, withdraw_order_id)
+            success, message, tx_id = self._submit_withdrawal(withdraw_params)
             
-            tx_id = result.get('id')
-            self.logger.info(f"提币成功: {coin} {amount} -> {address}, 交易ID: {tx_id}")
-            
-            return True, "提币请求已提交", tx_id
-            
-        except BinanceAPIException as e:
-            error_msg = f"Binance API错误: {e.message} (代码: {e.code})"
-            self.logger.error(error_msg)
-            return False, error_msg, None
+            if success:
+                self.logger.info(f"提币成功: {coin} {amount} -> {address}, 交易ID: {tx_id}")
+                if balance is not None:
+                    balance.commit(amount)
+            else:
+                self.logger.error(message)
+                if balance is not None:
+                    balance.release(amount)
+            return success, message, tx_id
             
         except Exception as e:
             error_msg = f"提币失败: {str(e)}"
             self.logger.error(error_msg)
+            if balance is not None:
+                balance.release(amount)
             return False, error_msg, None
     
+    def _submit_withdrawal(self, withdraw_params: Dict) -> Tuple[bool, str, Optional[str]]:
+        """提交提币请求，临时故障时退避重试"""
+        withdraw_order_id = withdraw_params['withdrawOrderId']
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self.client.withdraw(**withdraw_params)
+                return True, "提币请求已提交", result.get('id')
+            except Exception as e:
+                retryable, ambiguous, retry_after = classify_error(e)
+                if isinstance(e, BinanceAPIException):
+                    error_msg = f"Binance API错误: {e.message} (代码: {e.code})"
+                else:
+                    error_msg = f"提币失败: {str(e) or type(e).__name__}"
+                if not retryable:
+                    return False, error_msg, None
+                
+                if ambiguous:
+                    # 请求可能已被执行，确认之前不能重试
+                    try:
+                        existing = self.find_withdrawal(withdraw_order_id)
+                    except Exception as lookup_error:
+                        self.logger.error(f"查询提币{withdraw_order_id}失败: {str(lookup_error)}")
+                        return False, f"提币结果未知，请核对提币历史 (withdrawOrderId: {withdraw_order_id})", None
+                    if existing:
+                        return True, "提币请求已提交", existing.get('id')
+                
+                if attempt >= self.retry_policy.max_attempts:
+                    return False, f"{error_msg}，已重试{attempt - 1}次", None
+                delay = self.retry_policy.backoff(attempt, retry_after)
+                self.logger.warning(f"{error_msg}，{delay:.1f}秒后第{attempt}次重试 (withdrawOrderId: {withdraw_order_id})")
+                time.sleep(delay)
+    
+    def find_withdrawal(self, withdraw_order_id: str) -> Optional[Dict]:
+        """按客户端提币ID查询提币记录，不存在时返回None，查询失败时抛出异常"""
+        history = self.client.get_withdraw_history(withdrawOrderId=withdraw_order_id)
+        for item in history:
+            if item.get('withdrawOrderId') == withdraw_order_id:
+                return item
+        return None
+    
     def get_withdraw_history(self, coin: str = None, limit: int = 100) -> Optional[List[Dict]]:
         """获取提币历史"""
         if not self.client:
@@ -204,38 +559,85 @@ class BinanceWithdrawalClient:
                 
             history = self.client.get_withdraw_history(**params)
             
-            return [
-                {
-                    'id': item.get('id'),
-                    'coin': item.get('coin'),
-                    'network': item.get('network'),
-                    'address': item.get('address'),
-                    'amount': float(item.get('amount', 0)),
-                    'fee': float(item.get('transactionFee', 0)),
-                    'status': item.get('status'),
-                    'tx_id': item.get('txId'),
-                    'apply_time': item.get('applyTime'),
-                    'complete_time': item.get('completeTime')
-                }
-                for item in history
-            ]
+            return [format_withdraw_record(item) for item in history]
             
         except Exception as e:
             self.logger.error(f"获取提币历史失败: {str(e)}")
             return None
     
-    def get_withdraw_fee(self, coin: str, network: str = None) -> Optional[float]:
-        """获取提币手续费"""
+    def get_withdraw_history_page(self, start_time: int, end_time: int, coin: str = None,
+                                  offset: int = 0, limit: int = 1000) -> List[Dict]:
+        """
+        按时间范围分页获取原始提币记录，失败时抛出异常(供历史同步使用)
+
+        Args:
+            start_time: 开始时间(毫秒)
+            end_time: 结束时间(毫秒)，与开始时间相差不超过90天
+            coin: 币种，为空时获取全部币种
+            offset: 分页偏移
+            limit: 每页条数
+        """
         if not self.client:
-            return None
-            
-        try:
-            # 注意: 这个方法可能需要根据实际API调整
-            # Binance API可能没有直接获取手续费的接口
-            # 可以通过其他方式获取或使用预设值
-            fees = self.client.get_trade_fee(symbol=f"{coin}USDT")
-            return float(fees[0]['withdrawFee']) if fees else None
+            raise Exception("未连接到Binance API")
+
+        params = {'startTime': start_time, 'endTime': end_time, 'offset': offset, 'limit': limit}
+        if coin:
+            params['coin'] = coin
+        return self.client.get_withdraw_history(**params)
+    
+    def refresh_metadata(self):
+        """确保币种元数据可用(首次同步加载，过期后后台刷新)"""
+        if self.client:
+            self.metadata.ensure_fresh(self.client.get_all_coins_info)
+    
+    def get_coin_networks(self, coin: str) -> List[Dict]:
+        """获取币种支持的网络及其手续费、数量限制"""
+        self.refresh_metadata()
+        return self.metadata.networks(coin)
+    
+    def validate_withdrawal(self, coin: str, network: str, address: str, amount: float,
+                            address_tag: str = None) -> Tuple[bool, str]:
+        """使用缓存的元数据校验提币参数，不产生网络请求(元数据未加载时除外)"""
+        self.refresh_metadata()
+        return self.metadata.validate(coin, network, address, amount, address_tag)
+    
+    def validate_batch(self, coin: str, network: str, items: List[Tuple[str, float, Optional[str]]]) -> Tuple[bool, str]:
+        """
+        批量校验提币条目
+        
+        Args:
+            items: (地址, 数量, 地址标签) 列表
             
-        except Exception as e:
-            self.logger.error(f"获取{coin}提币手续费失败: {str(e)}")
-            return None
+        Returns:
+            (是否全部通过, 第一个失败条目的原因)
+        """
+        for address, amount, address_tag in items:
+            valid, reason = self.validate_withdrawal(coin, network, address, amount, address_tag)
+            if not valid:
+                return False, f"地址 {address} 校验失败: {reason}"
+        return True, ''
+    
+    def round_amount(self, coin: str, network: str, amount: float) -> float:
+        """按网络的数量步长向下取整(无元数据时保留8位小数)"""
+        self.refresh_metadata()
+        entry = self.metadata.lookup(coin, network)
+        if entry and entry['step']:
+            try:
+                step = Decimal(entry['step'])
+                if step > 0:
+                    return float((Decimal(str(amount)) // step) * step)
+            except InvalidOperation:
+                pass
+        return round(amount, 8)
+    
+    def get_withdraw_fee(self, coin: str, network: str = None) -> Optional[float]:
+        """获取提币手续费"""
+        self.refresh_metadata()
+        if network:
+            entry = self.metadata.lookup(coin, network)
+        else:
+            entry = next((item for item in self.metadata.networks(coin) if item['is_default']), None)
+        if entry:
+            return entry['fee']
+        # 元数据不可用时使用预设值
+        return Config.NETWORK_FEES.get((network or '').upper())
@@ -0,0 +1,124 @@
+import logging
+import math
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from config import Config
+
+
+class BoundedExecutor:
+    """有界后台执行器
+
+    固定数量的工作线程从队列中取任务执行。执行中和排队的任务总数达到上限时拒绝新任务，
+    由调用方返回429，突发请求只会排队或被拒绝，不会创建大量线程同时访问同一个API Key
+    和数据库。记录排队等待和执行耗时，据此估算被拒绝的请求应等待多久重试。
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        """
+        Args:
+            name: 执行器名称(用于线程名和统计)
+            max_workers: 工作线程数
+            max_queue: 排队上限
+        """
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.capacity = self.max_workers + max(0, max_queue)
+        self.stats = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._lock = threading.Lock()
+        self._reserved = 0
+        self._active = 0
+        self._wait_avg = 0.0
+        self._wait_max = 0.0
+        self._run_avg = 0.0
+        self.logger = logging.getLogger(__name__)
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker, name=f'{name}-{i}')
+            thread.daemon = True
+            thread.start()
+
+    def reserve(self, force: bool = False) -> bool:
+        """
+        预留一个位置，之后必须调用submit_reserved或release
+
+        Args:
+            force: 忽略上限(恢复已接受的任务时使用)
+
+        Returns:
+            是否预留成功
+        """
+        with self._lock:
+            if not force and self._reserved >= self.capacity:
+                self.stats['rejected'] += 1
+                return False
+            self._reserved += 1
+            return True
+
+    def release(self):
+        """释放未使用的预留位置"""
+        with self._lock:
+            self._reserved -= 1
+
+    def submit_reserved(self, fn: Callable, *args: Any):
+        """提交任务到已预留的位置"""
+        with self._lock:
+            self.stats['submitted'] += 1
+        self._queue.put((fn, args, time.monotonic()))
+
+    def submit(self, fn: Callable, *args: Any) -> bool:
+        """提交任务，队列已满时返回False"""
+        if not self.reserve():
+            return False
+        self.submit_reserved(fn, *args)
+        return True
+
+    def _worker(self):
+        while True:
+            fn, args, queued_at = self._queue.get()
+            started_at = time.monotonic()
+            with self._lock:
+                self._active += 1
+                wait = started_at - queued_at
+                self._wait_avg += 0.2 * (wait - self._wait_avg)
+                self._wait_max = max(self._wait_max, wait)
+            failed = False
+            try:
+                fn(*args)
+            except Exception as e:
+                failed = True
+                self.logger.error(f"后台任务执行异常 ({self.name}): {str(e)}")
+            with self._lock:
+                self._active -= 1
+                self._reserved -= 1
+                self._run_avg += 0.2 * (time.monotonic() - started_at - self._run_avg)
+                self.stats['failed' if failed else 'completed'] += 1
+
+    def retry_after(self) -> int:
+        """按排队长度和平均执行耗时估算的重试等待秒数"""
+        with self._lock:
+            queued = self._reserved - self._active
+            estimate = (queued + 1) * self._run_avg / self.max_workers
+        return int(min(Config.EXECUTOR_MAX_RETRY_AFTER, max(1, math.ceil(estimate))))
+
+    def queue_depth(self) -> int:
+        """排队中(已接受但尚未开始执行)的任务数"""
+        with self._lock:
+            return self._reserved - self._active
+
+    def get_stats(self) -> Dict:
+        """获取执行器统计"""
+        with self._lock:
+            return {
+                **self.stats,
+                'name': self.name,
+                'workers': self.max_workers,
+                'capacity': self.capacity,
+                'active': self._active,
+                'queue_depth': self._reserved - self._active,
+                'avg_wait_ms': round(self._wait_avg * 1000, 1),
+                'max_wait_ms': round(self._wait_max * 1000, 1),
+                'avg_run_ms': round(self._run_avg * 1000, 1)
+            }
@@ -0,0 +1,125 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from config import Config
+
+
+# 多个客户端共享的属性(日志器、限频调度器、共享连接池、元数据缓存、服务器时钟等)，不计入单个客户端的内存
+SHARED_ATTRIBUTES = frozenset(['logger', 'scheduler', 'adapters', 'metadata', 'clock'])
+
+
+def estimate_size(obj: Any, max_depth: int = 4) -> int:
+    """粗略估算对象占用的内存字节数"""
+    seen = set()
+
+    def sizeof(o: Any, depth: int) -> int:
+        if id(o) in seen:
+            return 0
+        seen.add(id(o))
+        size = sys.getsizeof(o, 0)
+        if depth >= max_depth:
+            return size
+        if isinstance(o, dict):
+            size += sum(sizeof(k, depth + 1) + sizeof(v, depth + 1) for k, v in list(o.items()))
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            size += sum(sizeof(i, depth + 1) for i in list(o))
+        elif hasattr(o, '__dict__') and not isinstance(o, type):
+            attrs = {k: v for k, v in vars(o).items() if k not in SHARED_ATTRIBUTES}
+            size += sizeof(attrs, depth + 1)
+        return size
+
+    return sizeof(obj, 0)
+
+
+class ClientRegistry:
+    """Binance客户端注册表
+
+    按会话保存客户端，超过容量时淘汰最久未使用的条目，空闲超过TTL的条目自动过期，
+    并统计命中率和估算内存占用。
+    """
+
+    def __init__(self, max_size: int = None, idle_ttl: float = None):
+        self.max_size = max_size or Config.CLIENT_REGISTRY_MAX_SIZE
+        self.idle_ttl = idle_ttl or Config.CLIENT_IDLE_TTL
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        # key -> [client, 最近访问时间, 估算字节数]，按最近访问顺序排列
+        self._entries: 'OrderedDict[str, list]' = OrderedDict()
+        self._memory = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._memory -= entry[2]
+
+    def _purge_expired(self, now: float):
+        # 条目按访问时间排序，从头部开始清理即可
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[1] <= self.idle_ttl:
+                break
+            self._remove(key)
+            self.stats['expirations'] += 1
+            self.logger.info(f"客户端空闲超时已释放 - Session: {key}")
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取客户端，不存在或已过期时返回None"""
+        with self._lock:
+            now = time.monotonic()
+            self._purge_expired(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            entry[1] = now
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key: str, client: Any):
+        """保存客户端，必要时淘汰最久未使用的条目"""
+        size = estimate_size(client)
+        with self._lock:
+            now = time.monotonic()
+            self._remove(key)
+            self._entries[key] = [client, now, size]
+            self._memory += size
+            self._purge_expired(now)
+            while len(self._entries) > self.max_size:
+                evicted = next(iter(self._entries))
+                self._remove(evicted)
+                self.stats['evictions'] += 1
+                self.logger.info(f"客户端注册表已满，淘汰 - Session: {evicted}")
+
+    def remove(self, key: str):
+        """移除客户端"""
+        with self._lock:
+            self._remove(key)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() - entry[1] <= self.idle_ttl
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """获取注册表统计"""
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'idle_ttl': self.idle_ttl,
+                'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+                'memory_bytes': self._memory
+            }
@@ -0,0 +1,200 @@
+import logging
+import re
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+
+# 本应用使用的网络名称 -> Binance接口返回的网络名称
+NETWORK_ALIASES = {
+    'TRC20': 'TRX',
+    'ERC20': 'ETH',
+    'BEP2': 'BNB',
+    'BEP20': 'BSC'
+}
+
+
+def _to_float(value, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class CoinMetadataCache:
+    """币种/网络元数据缓存
+
+    从Binance全部币种信息接口(capital/config/getall)加载，建立以(币种, 网络)为键的索引，
+    保存手续费、最小/最大提币数量、数量步长、地址格式和提币开关。
+    数据过期后在后台刷新，刷新期间继续使用旧数据，查询不产生网络请求。
+    """
+
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl or Config.COIN_METADATA_TTL
+        self.index: Dict[Tuple[str, str], Dict] = {}
+        self.coins: Dict[str, List[str]] = {}
+        self.loaded_at = 0.0
+        self.failed_at = 0.0
+        self._patterns: Dict[str, re.Pattern] = {}
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at > 0
+
+    def refresh(self, fetch: Callable[[], List[Dict]]) -> bool:
+        """同步刷新元数据"""
+        try:
+            coins = fetch()
+        except Exception as e:
+            self.failed_at = time.monotonic()
+            self.logger.error(f"获取币种元数据失败: {str(e)}")
+            return False
+
+        index = {}
+        coin_networks = {}
+        for coin_info in coins or []:
+            coin = coin_info.get('coin', '').upper()
+            for item in coin_info.get('networkList', []):
+                network = item.get('network', '').upper()
+                index[(coin, network)] = {
+                    'coin': coin,
+                    'network': network,
+                    'name': item.get('name'),
+                    'fee': _to_float(item.get('withdrawFee')),
+                    'min': _to_float(item.get('withdrawMin')),
+                    'max': _to_float(item.get('withdrawMax')),
+                    'step': item.get('withdrawIntegerMultiple') or None,
+                    'address_regex': item.get('addressRegex') or None,
+                    'memo_regex': item.get('memoRegex') or None,
+                    'withdraw_enabled': bool(item.get('withdrawEnable')),
+                    'is_default': bool(item.get('isDefault'))
+                }
+                coin_networks.setdefault(coin, []).append(network)
+
+        if not index:
+            # 测试网等环境可能返回空列表，此时视为元数据不可用，不做校验
+            self.failed_at = time.monotonic()
+            self.logger.warning("币种元数据为空，跳过本地校验")
+            return False
+
+        with self._lock:
+            self.index = index
+            self.coins = coin_networks
+            self.loaded_at = time.monotonic()
+        self.logger.info(f"币种元数据已更新: {len(coin_networks)}个币种, {len(index)}个网络")
+        return True
+
+    def needs_refresh(self) -> bool:
+        """是否需要(重新)加载元数据"""
+        now = time.monotonic()
+        if not self.loaded:
+            return now - self.failed_at > Config.COIN_METADATA_RETRY_INTERVAL
+        return now - self.loaded_at > self.ttl
+
+    def ensure_fresh(self, fetch: Callable[[], List[Dict]]):
+        """首次使用时同步加载，过期后在后台刷新"""
+        now = time.monotonic()
+        if not self.loaded:
+            # 并发的首次加载只请求一次；加载失败后短时间内不再重试
+            with self._load_lock:
+                if self.needs_refresh():
+                    self.refresh(fetch)
+            return
+        if now - self.loaded_at <= self.ttl:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def background_refresh():
+            try:
+                self.refresh(fetch)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        thread = threading.Thread(target=background_refresh, name='coin-metadata-refresh')
+        thread.daemon = True
+        thread.start()
+
+    def lookup(self, coin: str, network: str) -> Optional[Dict]:
+        """查询(币种, 网络)的元数据"""
+        coin = (coin or '').upper()
+        network = (network or '').upper()
+        index = self.index
+        entry = index.get((coin, network))
+        if entry is None and network in NETWORK_ALIASES:
+            entry = index.get((coin, NETWORK_ALIASES[network]))
+        return entry
+
+    def networks(self, coin: str) -> List[Dict]:
+        """获取币种支持的全部网络"""
+        coin = (coin or '').upper()
+        index = self.index
+        return [index[(coin, network)] for network in self.coins.get(coin, [])]
+
+    def _match(self, pattern: str, value: str) -> bool:
+        compiled = self._patterns.get(pattern)
+        if compiled is None:
+            try:
+                compiled = re.compile(pattern)
+            except re.error:
+                return True
+            self._patterns[pattern] = compiled
+        return compiled.fullmatch(value) is not None
+
+    def validate(self, coin: str, network: str, address: str, amount: float,
+                 address_tag: str = None) -> Tuple[bool, str]:
+        """
+        根据元数据校验一笔提币，元数据不可用时不做限制
+
+        Returns:
+            (是否通过, 失败原因)
+        """
+        if not self.loaded:
+            return True, ''
+
+        entry = self.lookup(coin, network)
+        if entry is None:
+            if (coin or '').upper() not in self.coins:
+                return False, f"不支持的币种: {coin}"
+            return False, f"{coin}不支持{network}网络"
+        if not entry['withdraw_enabled']:
+            return False, f"{coin}({network})当前暂停提币"
+        if entry['min'] and amount < entry['min']:
+            return False, f"提币数量低于最小值 {entry['min']}"
+        if entry['max'] and amount > entry['max']:
+            return False, f"提币数量超过最大值 {entry['max']}"
+        if entry['step']:
+            try:
+                step = Decimal(entry['step'])
+                if step > 0 and Decimal(str(amount)) % step != 0:
+                    return False, f"提币数量必须是 {entry['step']} 的整数倍"
+            except InvalidOperation:
+                pass
+        if entry['address_regex'] and not self._match(entry['address_regex'], address):
+            return False, f"地址格式错误: {address}"
+        if address_tag and entry['memo_regex'] and not self._match(entry['memo_regex'], address_tag):
+            return False, f"地址标签格式错误: {address_tag}"
+        return True, ''
+
+
+_caches: Dict[bool, CoinMetadataCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_metadata_cache(testnet: bool) -> CoinMetadataCache:
+    """获取进程级共享的元数据缓存(主网和测试网分开)"""
+    with _caches_lock:
+        cache = _caches.get(bool(testnet))
+        if cache is None:
+            cache = CoinMetadataCache()
+            _caches[bool(testnet)] = cache
+        return cache
@@ -16,6 +16,31 @@ class Config:
     
     # 数据库配置
     DATABASE_PATH = 'withdrawal_logs.db'
+    # SQLite连接配置: 页缓存大小(KB)、锁等待超时(毫秒)、每个连接缓存的预编译语句数
+    DB_CACHE_SIZE_KB = 8192
+    DB_BUSY_TIMEOUT = 5000
+    DB_STATEMENT_CACHE_SIZE = 128
+    # 连接池: 最多保持的连接数、连接全部借出时等待归还的秒数
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+    DB_POOL_TIMEOUT = 30
+    # 延迟批量写入: 最长写入间隔(毫秒)、积累到该条数时立即写入
+    DB_FLUSH_INTERVAL_MS = 50
+    DB_FLUSH_BATCH_SIZE = 200
+    # 退出时数据库繁忙，写完剩余记录最多重试的秒数
+    DB_CLOSE_TIMEOUT = 30
+    # 日志分页接口每页最大条数
+    LOG_PAGE_MAX_SIZE = 500
+    # 导出接口每次从数据库读取的条数
+    EXPORT_CHUNK_SIZE = 1000
+    # 统计接口最多查询的天数
+    STATS_MAX_DAYS = 366
+    # 日志保留: 数据库中保留的天数，更早的记录压缩归档到ARCHIVE_DIR后删除
+    RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', '90'))
+    ARCHIVE_DIR = 'archive'
+    RETENTION_CHUNK_SIZE = 1000
+    RETENTION_INTERVAL = 86400
+    # 单次查询归档允许跨越的最大天数
+    ARCHIVE_QUERY_MAX_DAYS = 31
     
     # 日志配置
     LOG_LEVEL = 'INFO'
@@ -24,7 +49,103 @@ class Config:
     # 提币安全配置
     MAX_WITHDRAWAL_AMOUNT = float(os.environ.get('MAX_WITHDRAWAL_AMOUNT', '1000'))
     REQUIRE_CONFIRMATION = os.environ.get('REQUIRE_CONFIRMATION', 'True').lower() == 'true'
-    
+
+    # 请求调度配置 - 令牌桶: 接口类别 -> (容量, 每秒补充量)
+    RATE_LIMIT_BUCKETS = {
+        'read': (50, 20.0),
+        'withdraw': (5, 2.0)
+    }
+    # 服务端限频响应头 -> 对应窗口内的额度上限
+    RATE_LIMIT_HEADER_LIMITS = {
+        'X-MBX-USED-WEIGHT-1M': 6000,
+        'X-SAPI-USED-IP-WEIGHT-1M': 12000,
+        'X-SAPI-USED-UID-WEIGHT-1M': 180000,
+        'X-MBX-ORDER-COUNT-10S': 100,
+        'X-MBX-ORDER-COUNT-1D': 200000
+    }
+    # 已用额度达到上限的该比例时暂停派发，直到窗口结束
+    RATE_LIMIT_SAFETY_RATIO = 0.9
+
+    # 批量提币并发配置
+    BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '4'))
+    BATCH_MAX_CONCURRENCY = 16
+    # 各网络同时进行中的提币上限(所有批量任务共享)，未列出的网络以批量并发数上限为准
+    BATCH_NETWORK_CONCURRENCY = {
+        'BTC': 2,
+        'ERC20': 4
+    }
+    # 批量任务改用异步客户端在共享事件循环中并发提交(不为每个并发请求占用线程)，
+    # 以及等待网络并发空位的轮询间隔(秒)
+    BATCH_ASYNC = os.environ.get('BATCH_ASYNC', 'False').lower() == 'true'
+    BATCH_ASYNC_POLL_INTERVAL = 0.05
+    # 批量任务余额快照的最长有效秒数
+    BALANCE_SNAPSHOT_MAX_AGE = 60
+
+    # 后台执行器配置: 工作线程数、排队上限(执行中和排队的总数达到上限时返回429)
+    WITHDRAW_WORKERS = int(os.environ.get('WITHDRAW_WORKERS', '4'))
+    WITHDRAW_QUEUE_SIZE = int(os.environ.get('WITHDRAW_QUEUE_SIZE', '100'))
+    TASK_WORKERS = int(os.environ.get('TASK_WORKERS', '4'))
+    TASK_QUEUE_SIZE = int(os.environ.get('TASK_QUEUE_SIZE', '20'))
+    # 队列满时建议的重试等待秒数上限
+    EXECUTOR_MAX_RETRY_AFTER = 60
+    # 智能提币定时调度: 执行到期步骤的线程数(等待间隔不占用线程)
+    SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', '4'))
+    # 任务进度推送: 合并发送的间隔(毫秒)、每帧最多携带的条目数
+    PROGRESS_FRAME_INTERVAL_MS = 250
+    PROGRESS_FRAME_ITEMS = 20
+    # 任务结束后保留其版本号的秒数，之后释放(重新轮询时按新版本号返回一次最终状态)
+    PROGRESS_VERSION_TTL = 600
+    # 任务状态接口长轮询的最长等待秒数
+    TASK_POLL_MAX_WAIT = 30
+
+    # 共享HTTP连接池配置
+    HTTP_POOL_CONNECTIONS = 10
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '32'))
+    DNS_CACHE_TTL = 300
+
+    # 异步客户端配置: 共享会话连接上限、单次调用超时(秒)、同时进行中的请求上限
+    ASYNC_HTTP_LIMIT = 200
+    ASYNC_REQUEST_TIMEOUT = 15
+    ASYNC_MAX_IN_FLIGHT = 200
+
+    # 服务器时间同步配置: 后台刷新间隔(秒)、每次同步的采样次数、时间差平滑系数
+    CLOCK_SYNC_INTERVAL = 60
+    CLOCK_SYNC_SAMPLES = 3
+    CLOCK_EWMA_ALPHA = 0.3
+    # recvWindow(毫秒) = 下限 + 系数 * 平均往返延迟，不超过上限(接口允许的最大值60000)
+    RECV_WINDOW_MIN = 5000
+    RECV_WINDOW_MAX = 60000
+    RECV_WINDOW_LATENCY_FACTOR = 4
+
+    # 连接健康缓存有效期(秒)，有效期内同一组凭据不重复握手
+    CONNECTION_HEALTH_TTL = 300
+
+    # 客户端注册表配置
+    CLIENT_REGISTRY_MAX_SIZE = int(os.environ.get('CLIENT_REGISTRY_MAX_SIZE', '100'))
+    CLIENT_IDLE_TTL = int(os.environ.get('CLIENT_IDLE_TTL', '1800'))
+    # 按已保存的配置重建客户端失败后，再次尝试前等待的秒数
+    CLIENT_REBUILD_BACKOFF = 30
+
+    # 提币历史增量同步配置: 单个时间窗口天数(接口上限90天)、每页条数(接口上限1000)、
+    # 首次同步回溯天数、游标回退秒数(防止边界上的记录漏同步)
+    HISTORY_SYNC_WINDOW_DAYS = 90
+    HISTORY_SYNC_PAGE_SIZE = 1000
+    HISTORY_SYNC_INITIAL_DAYS = 90
+    HISTORY_SYNC_OVERLAP = 60
+    # 后台历史同步的工作线程数和排队上限
+    HISTORY_SYNC_WORKERS = 1
+    HISTORY_SYNC_QUEUE_SIZE = 10
+
+    # 提币重试配置: 最多尝试次数、退避基准秒数、单次退避上限秒数
+    RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', '4'))
+    RETRY_BASE_DELAY = 0.5
+    RETRY_MAX_DELAY = 30
+
+    # 提币状态对账轮询间隔(秒)
+    RECONCILE_INTERVAL = int(os.environ.get('RECONCILE_INTERVAL', '30'))
+    # 对账只查询提交后这么多天内的记录，更早仍未确认的记录标记为UNCONFIRMED由人工核对
+    RECONCILE_MAX_AGE_DAYS = int(os.environ.get('RECONCILE_MAX_AGE_DAYS', '7'))
+
     # 支持的币种和网络
     SUPPORTED_COINS = {
         'USDT': ['TRC20', 'ERC20', 'BSC', 'OPBNB'],
@@ -34,7 +155,11 @@ class Config:
         'BUSD': ['BSC', 'ERC20']
     }
     
-    # 网络费用配置
+    # 币种元数据缓存配置(秒): 有效期、加载失败后的重试间隔
+    COIN_METADATA_TTL = 600
+    COIN_METADATA_RETRY_INTERVAL = 60
+
+    # 网络费用配置(元数据不可用时的预设值)
     NETWORK_FEES = {
         'TRC20': 1.0,
         'ERC20': 15.0,
@@ -1,19 +1,579 @@
+import atexit
+import base64
+import binascii
+import logging
+import queue
 import sqlite3
 import json
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+
+# 常用语句保持为固定文本，sqlite3按语句文本缓存预编译结果，各连接只编译一次
+INSERT_WITHDRAWAL_LOG = '''
+    INSERT INTO withdrawal_logs
+    (coin, network, address, amount, fee, status, tx_id, error_message, withdraw_order_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+INSERT_BATCH_WITHDRAWAL_LOG = '''
+    INSERT INTO withdrawal_logs
+    (coin, network, address, address_tag, amount, fee, status, withdraw_order_id, batch_id, item_index)
+    VALUES (:coin, :network, :address, :address_tag, :amount, :fee, 'PENDING',
+            :withdraw_order_id, :batch_id, :item_index)
+'''
+UPDATE_WITHDRAWAL_STATUS = '''
+    UPDATE withdrawal_logs
+    SET status = ?, tx_id = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+SELECT_SUBMITTED_WITHDRAWALS = '''
+    SELECT id, coin, network, address, amount, fee, tx_id, created_at FROM withdrawal_logs
+    WHERE status = 'SUBMITTED' AND tx_id IS NOT NULL
+'''
+APPLY_WITHDRAWAL_TRANSITION = '''
+    UPDATE withdrawal_logs
+    SET status = :status, chain_tx_id = :chain_tx_id, fee = :fee,
+        error_message = :error_message, updated_at = CURRENT_TIMESTAMP
+    WHERE id = :id AND status = 'SUBMITTED'
+'''
+INSERT_OPERATION_LOG = '''
+    INSERT INTO operation_logs (operation, details, status, error_message)
+    VALUES (?, ?, ?, ?)
+'''
+SELECT_DAILY_STATS = '''
+    SELECT day, coin, network,
+           SUM(count) AS total,
+           SUM(CASE WHEN status = 'PENDING' THEN count ELSE 0 END) AS pending,
+           SUM(CASE WHEN status IN ('SUBMITTED', 'COMPLETED') THEN count ELSE 0 END) AS succeeded,
+           SUM(CASE WHEN status = 'COMPLETED' THEN count ELSE 0 END) AS completed,
+           SUM(CASE WHEN status = 'FAILED' THEN count ELSE 0 END) AS failed,
+           SUM(CASE WHEN status = 'CANCELLED' THEN count ELSE 0 END) AS cancelled,
+           SUM(CASE WHEN status IN ('SUBMITTED', 'COMPLETED') THEN amount ELSE 0 END) AS volume,
+           SUM(CASE WHEN status IN ('SUBMITTED', 'COMPLETED') THEN fee ELSE 0 END) AS fees
+    FROM withdrawal_daily_stats
+    WHERE day >= date('now', ?) AND (? IS NULL OR coin = ?) AND (? IS NULL OR network = ?)
+    GROUP BY day, coin, network
+    HAVING SUM(count) > 0
+    ORDER BY day DESC, coin, network
+'''
+INSERT_BATCH_TASK = '''
+    INSERT INTO batch_tasks (id, task_type, coin, network, status, total, params)
+    VALUES (?, ?, ?, ?, 'PROCESSING', ?, ?)
+'''
+UPDATE_BATCH_TASK_PROGRESS = '''
+    UPDATE batch_tasks
+    SET completed = ?, failed = ?, checkpoint = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+UPDATE_BATCH_TASK_STATUS = '''
+    UPDATE batch_tasks
+    SET status = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+TRANSITION_BATCH_TASK_STATUS = '''
+    UPDATE batch_tasks
+    SET status = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND status = ?
+'''
+CANCEL_BATCH_ITEMS = '''
+    UPDATE withdrawal_logs
+    SET status = 'CANCELLED', error_message = '任务已取消', updated_at = CURRENT_TIMESTAMP
+    WHERE batch_id = ? AND status = 'PENDING'
+'''
+SELECT_BATCH_TASK = 'SELECT * FROM batch_tasks WHERE id = ?'
+SELECT_BATCH_TASKS = '''
+    SELECT * FROM batch_tasks
+    WHERE (? IS NULL OR status = ?)
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+SELECT_UNFINISHED_BATCH_TASKS = "SELECT * FROM batch_tasks WHERE status = 'PROCESSING' ORDER BY created_at"
+SELECT_BATCH_ITEMS = 'SELECT * FROM withdrawal_logs WHERE batch_id = ? ORDER BY item_index, id'
+UPSERT_CONFIG = '''
+    INSERT OR REPLACE INTO app_config (key, value, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+'''
+SELECT_ALL_CONFIG = 'SELECT key, value FROM app_config'
+UPSERT_EXCHANGE_WITHDRAWAL = '''
+    INSERT INTO exchange_withdrawals
+    (id, coin, network, address, address_tag, amount, fee, status, tx_id,
+     withdraw_order_id, apply_time, apply_ts, complete_time, info)
+    VALUES (:id, :coin, :network, :address, :address_tag, :amount, :fee, :status, :tx_id,
+            :withdraw_order_id, :apply_time, :apply_ts, :complete_time, :info)
+    ON CONFLICT(id) DO UPDATE SET
+        status = excluded.status,
+        tx_id = excluded.tx_id,
+        fee = excluded.fee,
+        complete_time = excluded.complete_time,
+        info = excluded.info,
+        updated_at = CURRENT_TIMESTAMP
+'''
+SELECT_EXCHANGE_WITHDRAWALS = '''
+    SELECT * FROM exchange_withdrawals
+    ORDER BY apply_ts DESC
+    LIMIT ?
+'''
+SELECT_EXCHANGE_WITHDRAWALS_BY_COIN = '''
+    SELECT * FROM exchange_withdrawals
+    WHERE coin = ?
+    ORDER BY apply_ts DESC
+    LIMIT ?
+'''
+SELECT_SYNC_CURSOR = 'SELECT cursor FROM sync_cursors WHERE coin = ?'
+UPSERT_SYNC_CURSOR = '''
+    INSERT OR REPLACE INTO sync_cursors (coin, cursor, synced_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+'''
+
+# 数据库结构迁移，按版本号顺序执行，当前版本记录在PRAGMA user_version中
+MIGRATIONS = [
+    (1, [
+        # 提币记录: 按时间倒序分页，以及按状态/币种网络/地址过滤后分页
+        'CREATE INDEX IF NOT EXISTS idx_withdrawal_logs_created ON withdrawal_logs (created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_withdrawal_logs_status ON withdrawal_logs (status, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_withdrawal_logs_coin_network ON withdrawal_logs (coin, network, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_withdrawal_logs_address ON withdrawal_logs (address, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_withdrawal_logs_tx_id ON withdrawal_logs (tx_id)',
+        # 操作日志
+        'CREATE INDEX IF NOT EXISTS idx_operation_logs_timestamp ON operation_logs (timestamp, id)',
+        'CREATE INDEX IF NOT EXISTS idx_operation_logs_status ON operation_logs (status, timestamp, id)',
+    ]),
+    (2, [
+        'CREATE INDEX IF NOT EXISTS idx_withdrawal_logs_batch ON withdrawal_logs (batch_id, id)',
+    ]),
+    (3, [
+        # 按(日期, 币种, 网络, 状态)汇总的提币统计，由触发器随写入增量维护。
+        # 不设删除触发器，归档清理旧记录后统计仍然保留
+        '''
+        CREATE TABLE IF NOT EXISTS withdrawal_daily_stats (
+            day TEXT NOT NULL,
+            coin TEXT NOT NULL,
+            network TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            amount REAL NOT NULL DEFAULT 0,
+            fee REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, coin, network, status)
+        )
+        ''',
+        '''
+        INSERT OR REPLACE INTO withdrawal_daily_stats (day, coin, network, status, count, amount, fee)
+        SELECT date(created_at), coin, network, status, COUNT(*), SUM(amount), SUM(fee)
+        FROM withdrawal_logs
+        GROUP BY date(created_at), coin, network, status
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_withdrawal_stats_insert AFTER INSERT ON withdrawal_logs
+        BEGIN
+            INSERT INTO withdrawal_daily_stats (day, coin, network, status, count, amount, fee)
+            VALUES (date(NEW.created_at), NEW.coin, NEW.network, NEW.status, 1, NEW.amount, NEW.fee)
+            ON CONFLICT (day, coin, network, status) DO UPDATE SET
+                count = count + 1,
+                amount = amount + excluded.amount,
+                fee = fee + excluded.fee;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_withdrawal_stats_update
+        AFTER UPDATE OF status, amount, fee, coin, network ON withdrawal_logs
+        WHEN OLD.status IS NOT NEW.status OR OLD.amount IS NOT NEW.amount OR OLD.fee IS NOT NEW.fee
+            OR OLD.coin IS NOT NEW.coin OR OLD.network IS NOT NEW.network
+        BEGIN
+            UPDATE withdrawal_daily_stats SET
+                count = count - 1,
+                amount = amount - OLD.amount,
+                fee = fee - OLD.fee
+            WHERE day = date(OLD.created_at) AND coin = OLD.coin AND network = OLD.network AND status = OLD.status;
+            INSERT INTO withdrawal_daily_stats (day, coin, network, status, count, amount, fee)
+            VALUES (date(NEW.created_at), NEW.coin, NEW.network, NEW.status, 1, NEW.amount, NEW.fee)
+            ON CONFLICT (day, coin, network, status) DO UPDATE SET
+                count = count + 1,
+                amount = amount + excluded.amount,
+                fee = fee + excluded.fee;
+        END
+        ''',
+    ]),
+]
+
+# 可归档的表 -> (时间字段, 可归档条件)；处理中的提币记录不归档，对账仍需要它们
+RETENTION_TABLES = {
+    'operation_logs': ('timestamp', '1 = 1'),
+    'withdrawal_logs': ('created_at', "status NOT IN ('PENDING', 'SUBMITTED')"),
+}
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """把分页位置编码为不透明的游标字符串"""
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    """解析游标字符串，格式错误时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return sort_value, int(row_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+def keyset_query(table: str, sort_column: str, filters: Dict[str, object], cursor: Optional[str],
+                 start_time: str = None, end_time: str = None) -> Tuple[str, List]:
+    """
+    构造按(sort_column, id)倒序的键集分页查询
+
+    Args:
+        table: 表名
+        sort_column: 时间排序字段
+        filters: 等值过滤条件 字段 -> 值，值为None的条件忽略
+        cursor: 上一页返回的游标
+        start_time: 起始时间(含)
+        end_time: 结束时间(不含)
+
+    Returns:
+        (SQL, 参数)，SQL末尾的LIMIT参数由调用方追加
+    """
+    conditions = []
+    params = []
+    for column, value in filters.items():
+        if value is not None:
+            conditions.append(f'{column} = ?')
+            params.append(value)
+    if start_time:
+        conditions.append(f'{sort_column} >= ?')
+        params.append(start_time)
+    if end_time:
+        conditions.append(f'{sort_column} < ?')
+        params.append(end_time)
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        conditions.append(f'({sort_column}, id) < (?, ?)')
+        params.extend([sort_value, row_id])
+
+    sql = f'SELECT * FROM {table}'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += f' ORDER BY {sort_column} DESC, id DESC LIMIT ?'
+    return sql, params
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """等待空闲连接超时"""
+
+
+def is_busy_error(error: Exception) -> bool:
+    """数据库被锁定或连接池暂时耗尽等稍后重试即可成功的错误"""
+    if isinstance(error, PoolTimeoutError):
+        return True
+    return isinstance(error, sqlite3.OperationalError) and any(
+        text in str(error).lower() for text in ('database is locked', 'database table is locked', 'busy')
+    )
+
+
+class ConnectionPool:
+    """有上限的SQLite连接池
+
+    最多保持max_size个长连接(WAL日志模式，调优后的同步/缓存参数)，在线程之间借出和归还。
+    HTTP服务器为每个请求新建线程，请求线程借用已有连接，不会每次重新建立连接和设置参数。
+    同一线程嵌套借用时复用已借出的连接，不会因连接耗尽而等待自己。
+    """
+
+    def __init__(self, db_path: str, max_size: int = None, timeout: float = None):
+        """
+        Args:
+            db_path: 数据库文件路径
+            max_size: 最多保持的连接数
+            timeout: 连接全部借出时等待归还的秒数
+        """
+        self.db_path = db_path
+        self.max_size = max(1, max_size or Config.DB_POOL_SIZE)
+        self.timeout = timeout or Config.DB_POOL_TIMEOUT
+        self._idle: 'queue.LifoQueue' = queue.LifoQueue()
+        self._connections: List[sqlite3.Connection] = []
+        self._size = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {'connections_created': 0, 'connections_closed': 0, 'checkouts': 0, 'waits': 0}
+
+    def _create(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=Config.DB_BUSY_TIMEOUT / 1000,
+            check_same_thread=False,
+            cached_statements=Config.DB_STATEMENT_CACHE_SIZE
+        )
+        try:
+            conn.row_factory = sqlite3.Row
+            # 新建的数据库使用增量回收，旧数据库由归档任务执行一次VACUUM后生效
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA cache_size=-{int(Config.DB_CACHE_SIZE_KB)}')
+            conn.execute(f'PRAGMA busy_timeout={int(Config.DB_BUSY_TIMEOUT)}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._size < self.max_size
+            if grow:
+                self._size += 1
+            else:
+                self.stats['waits'] += 1
+        if grow:
+            try:
+                conn = self._create()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+            with self._lock:
+                self._connections.append(conn)
+                self.stats['connections_created'] += 1
+            return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(f"等待数据库连接超时({self.timeout}秒)") from None
+
+    def _checkin(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            # 借用方未结束的事务不带给下一个借用方
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """借用一个连接，退出时归还"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._checkout()
+        with self._lock:
+            self.stats['checkouts'] += 1
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._checkin(conn)
+
+    def close_all(self):
+        """关闭全部连接(应在没有借出的连接时调用)"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self.stats['connections_closed'] += len(self._connections)
+            self._size -= len(self._connections)
+            self._connections.clear()
+            self._idle = queue.LifoQueue()
+
+    def get_stats(self) -> Dict:
+        """获取连接池统计"""
+        with self._lock:
+            return {
+                **self.stats,
+                'max_size': self.max_size,
+                'open_connections': len(self._connections),
+                'idle_connections': self._idle.qsize()
+            }
+
+
+class WriteBehindQueue:
+    """延迟批量写入队列
+
+    调用方只把(语句, 参数)放入队列后立即返回；后台线程每隔固定时间或积累到一定条数时，
+    把同一语句的记录合并为executemany，在一个事务中写入。数据库被锁定(如VACUUM期间)时
+    整批放回队列稍后重试，只有记录本身出错(约束、数据错误)才丢弃该条记录。进程退出
+    (包括收到SIGTERM)时写完队列中剩余的记录。
+    """
+
+    def __init__(self, pool: ConnectionPool, interval_ms: float = None, batch_size: int = None):
+        """
+        Args:
+            pool: 连接池
+            interval_ms: 最长写入间隔(毫秒)
+            batch_size: 积累到该条数时立即写入
+        """
+        self.pool = pool
+        self.interval = (interval_ms or Config.DB_FLUSH_INTERVAL_MS) / 1000
+        self.batch_size = batch_size or Config.DB_FLUSH_BATCH_SIZE
+        self.stats = {'queued': 0, 'written': 0, 'flushes': 0, 'retries': 0, 'dropped': 0}
+        self._items: List[Tuple[str, tuple]] = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self.logger = logging.getLogger(__name__)
+        self._thread = threading.Thread(target=self._run, name='db-write-behind')
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, sql: str, params: tuple):
+        """放入一条待写入记录"""
+        with self._cond:
+            self._items.append((sql, params))
+            self.stats['queued'] += 1
+            if len(self._items) >= self.batch_size:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.interval
+                while not self._closed and len(self._items) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                closed = self._closed
+            if closed:
+                return
+            try:
+                if not self.flush():
+                    time.sleep(self.interval)
+            except Exception as e:
+                # 记录仍在队列中，等待一个间隔后重试，写入线程不退出
+                self.logger.error(f"延迟写入失败，稍后重试: {str(e)}")
+                time.sleep(self.interval)
+
+    def _requeue(self, items: List[Tuple[str, tuple]]):
+        """把未写入的记录放回队列头部，保持原有顺序"""
+        with self._cond:
+            self._items[:0] = items
+            self.stats['retries'] += 1
+
+    def flush(self) -> bool:
+        """
+        立即写入队列中的全部记录(读取前调用以保证读到自己的写入)
+
+        Returns:
+            是否全部写入；数据库被锁定时记录放回队列，由后台线程稍后重试
+        """
+        with self._flush_lock:
+            with self._cond:
+                if not self._items:
+                    return True
+            # 先取得连接再取出记录，取连接失败时记录仍在队列中
+            with self.pool.connection() as conn:
+                with self._cond:
+                    items, self._items = self._items, []
+                # 未写入也未丢弃的记录，无论以何种方式退出都放回队列
+                pending = items
+                written = dropped = 0
+                try:
+                    # 只合并相邻的同一语句，整体仍按入队顺序写入
+                    try:
+                        with conn:
+                            for sql, run in groupby(items, key=itemgetter(0)):
+                                conn.executemany(sql, [params for _, params in run])
+                        written, pending = len(items), []
+                    except sqlite3.Error as e:
+                        if is_busy_error(e):
+                            self.logger.warning(f"数据库繁忙，{len(items)}条记录稍后重试: {str(e)}")
+                            return False
+                        # 记录本身有问题时逐条重写，只丢弃出错的记录
+                        self.logger.error(f"批量写入失败，改为逐条写入: {str(e)}")
+                        for index, (sql, params) in enumerate(items):
+                            try:
+                                with conn:
+                                    conn.execute(sql, params)
+                                written += 1
+                            except sqlite3.Error as row_error:
+                                if is_busy_error(row_error):
+                                    return False
+                                dropped += 1
+                                self.logger.error(f"写入记录失败，已丢弃: {str(row_error)} {params}")
+                            pending = items[index + 1:]
+                finally:
+                    if pending:
+                        self._requeue(pending)
+                    self.stats['written'] += written
+                    self.stats['dropped'] += dropped
+            self.stats['flushes'] += 1
+            return True
+
+    def close(self, timeout: float = None):
+        """
+        停止后台线程并写完剩余记录
+
+        Args:
+            timeout: 数据库繁忙时最多重试的秒数
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        deadline = time.monotonic() + (timeout or Config.DB_CLOSE_TIMEOUT)
+        while True:
+            try:
+                if self.flush():
+                    return
+            except Exception as e:
+                self.logger.error(f"退出时写入失败: {str(e)}")
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(self.interval)
+        with self._cond:
+            pending = len(self._items)
+        self.logger.error(f"退出时仍有{pending}条记录未能写入数据库")
+
+    def get_stats(self) -> Dict:
+        """获取写入队列统计"""
+        with self._cond:
+            return {**self.stats, 'pending': len(self._items)}
+
 
 class DatabaseManager:
     """数据库管理类"""
     
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path)
         self.init_database()
+        # app_config整表缓存在内存中，写入时同步更新，读取不访问数据库
+        self._config_lock = threading.Lock()
+        self._config = self._load_config()
+        # 操作日志和提币状态更新延迟批量写入，不阻塞提币流程
+        self.writer = WriteBehindQueue(self.pool)
+    
+    def _fetchall(self, sql: str, params=()) -> List[sqlite3.Row]:
+        """借用连接执行查询并取出全部结果"""
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+    
+    def _fetchone(self, sql: str, params=()) -> Optional[sqlite3.Row]:
+        """借用连接执行查询并取出第一行"""
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        """借用连接执行一个事务，正常结束时提交，异常时回滚"""
+        with self.pool.connection() as conn:
+            with conn:
+                yield conn.cursor()
     
     def init_database(self):
         """初始化数据库表"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._transaction() as cursor:
             
             # 创建提币记录表
             cursor.execute('''
@@ -33,6 +593,33 @@ class DatabaseManager:
                 )
             ''')
             
+            # 旧版本数据库补充链上交易哈希字段(tx_id保存的是Binance提币ID)
+            self._ensure_column(cursor, 'withdrawal_logs', 'chain_tx_id', 'TEXT')
+            self._ensure_column(cursor, 'withdrawal_logs', 'withdraw_order_id', 'TEXT')
+            self._ensure_column(cursor, 'withdrawal_logs', 'batch_id', 'TEXT')
+            # 批量任务条目的序号和地址标签，任务中断后据此恢复执行
+            self._ensure_column(cursor, 'withdrawal_logs', 'item_index', 'INTEGER')
+            self._ensure_column(cursor, 'withdrawal_logs', 'address_tag', 'TEXT')
+            
+            # 创建批量任务表，checkpoint为之前条目均已处理完成的下一个条目序号
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS batch_tasks (
+                    id TEXT PRIMARY KEY,
+                    task_type TEXT NOT NULL,
+                    coin TEXT NOT NULL,
+                    network TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    checkpoint INTEGER NOT NULL DEFAULT 0,
+                    params TEXT,
+                    error_message TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
             # 创建操作日志表
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS operation_logs (
@@ -45,6 +632,40 @@ class DatabaseManager:
                 )
             ''')
             
+            # 创建交易所提币记录表(从Binance提币历史增量同步)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS exchange_withdrawals (
+                    id TEXT PRIMARY KEY,
+                    coin TEXT NOT NULL,
+                    network TEXT,
+                    address TEXT,
+                    address_tag TEXT,
+                    amount REAL NOT NULL,
+                    fee REAL NOT NULL,
+                    status INTEGER NOT NULL,
+                    tx_id TEXT,
+                    withdraw_order_id TEXT,
+                    apply_time TEXT,
+                    apply_ts INTEGER NOT NULL,
+                    complete_time TEXT,
+                    info TEXT,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_exchange_withdrawals_coin_apply
+                ON exchange_withdrawals (coin, apply_ts)
+            ''')
+            
+            # 创建同步游标表(每个币种一个applyTime游标，空字符串表示全部币种)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sync_cursors (
+                    coin TEXT PRIMARY KEY,
+                    cursor INTEGER NOT NULL,
+                    synced_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
             # 创建配置表
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS app_config (
@@ -54,83 +675,303 @@ class DatabaseManager:
                 )
             ''')
             
-            conn.commit()
+            self._migrate(cursor)
+    
+    @staticmethod
+    def _migrate(cursor):
+        """执行尚未应用的结构迁移"""
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        for target, statements in MIGRATIONS:
+            if target <= version:
+                continue
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(f'PRAGMA user_version = {int(target)}')
+    
+    @staticmethod
+    def _ensure_column(cursor, table: str, column: str, definition: str):
+        """表中缺少字段时补充该字段"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
     
     def add_withdrawal_log(self, coin: str, network: str, address: str, 
                           amount: float, fee: float, status: str, 
-                          tx_id: str = None, error_message: str = None) -> int:
+                          tx_id: str = None, error_message: str = None,
+                          withdraw_order_id: str = None) -> int:
         """添加提币记录"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO withdrawal_logs 
-                (coin, network, address, amount, fee, status, tx_id, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (coin, network, address, amount, fee, status, tx_id, error_message))
-            conn.commit()
+        with self._transaction() as cursor:
+            cursor.execute(INSERT_WITHDRAWAL_LOG, (coin, network, address, amount, fee, status,
+                                                   tx_id, error_message, withdraw_order_id))
             return cursor.lastrowid
     
+    def create_batch_task(self, task_id: str, task_type: str, coin: str, network: str,
+                          items: List[Dict], params: Dict = None) -> List[int]:
+        """
+        在一个事务中创建批量任务，并把全部条目登记为PENDING
+        
+        Args:
+            task_id: 任务ID
+            task_type: 任务类型(BATCH/SMART)
+            coin: 币种
+            network: 网络
+            items: 条目列表，每项包含address, amount，可选address_tag, fee, withdraw_order_id
+            params: 任务执行参数(并发数、间隔等)
+            
+        Returns:
+            与items顺序一致的记录ID列表
+        """
+        ids = []
+        with self._transaction() as cursor:
+            cursor.execute(INSERT_BATCH_TASK, (task_id, task_type, coin, network, len(items),
+                                               json.dumps(params or {})))
+            for index, item in enumerate(items):
+                cursor.execute(INSERT_BATCH_WITHDRAWAL_LOG, {
+                    'coin': coin,
+                    'network': network,
+                    'address': item['address'],
+                    'address_tag': item.get('address_tag'),
+                    'amount': item['amount'],
+                    'fee': item.get('fee', 0),
+                    'withdraw_order_id': item.get('withdraw_order_id'),
+                    'batch_id': task_id,
+                    'item_index': index
+                })
+                ids.append(cursor.lastrowid)
+        return ids
+    
+    def update_batch_progress(self, task_id: str, completed: int, failed: int, checkpoint: int):
+        """更新批量任务的计数和执行位置(延迟批量写入，与条目状态在同一事务中落盘)"""
+        self.writer.put(UPDATE_BATCH_TASK_PROGRESS, (completed, failed, checkpoint, task_id))
+    
+    def set_batch_task_status(self, task_id: str, status: str, error_message: str = None):
+        """更新批量任务的状态(延迟批量写入)"""
+        self.writer.put(UPDATE_BATCH_TASK_STATUS, (status, error_message, task_id))
+    
+    def transition_batch_task(self, task_id: str, from_status: str, to_status: str) -> bool:
+        """仅当任务处于from_status时改为to_status(立即写入)，并发调用中只有一个返回True"""
+        self.writer.flush()
+        with self._transaction() as cursor:
+            cursor.execute(TRANSITION_BATCH_TASK_STATUS, (to_status, task_id, from_status))
+            return cursor.rowcount == 1
+    
+    def cancel_batch_items(self, task_id: str):
+        """把任务中尚未处理的条目标记为已取消(延迟批量写入)"""
+        self.writer.put(CANCEL_BATCH_ITEMS, (task_id,))
+    
+    @staticmethod
+    def _batch_task_row(row) -> Dict:
+        task = dict(row)
+        task['params'] = json.loads(task['params'] or '{}')
+        return task
+    
+    def get_batch_task(self, task_id: str) -> Optional[Dict]:
+        """获取批量任务，不存在时返回None"""
+        self.writer.flush()
+        row = self._fetchone(SELECT_BATCH_TASK, (task_id,))
+        return self._batch_task_row(row) if row else None
+    
+    def get_batch_tasks(self, limit: int = 50, status: str = None) -> List[Dict]:
+        """按创建时间倒序获取批量任务"""
+        self.writer.flush()
+        rows = self._fetchall(SELECT_BATCH_TASKS, (status, status, limit))
+        return [self._batch_task_row(row) for row in rows]
+    
+    def get_unfinished_batch_tasks(self) -> List[Dict]:
+        """获取仍处于执行中状态(进程退出时被中断)的批量任务"""
+        self.writer.flush()
+        rows = self._fetchall(SELECT_UNFINISHED_BATCH_TASKS)
+        return [self._batch_task_row(row) for row in rows]
+    
+    def get_batch_items(self, task_id: str) -> List[Dict]:
+        """按序号获取批量任务的全部条目"""
+        self.writer.flush()
+        rows = self._fetchall(SELECT_BATCH_ITEMS, (task_id,))
+        return [dict(row) for row in rows]
+    
     def update_withdrawal_status(self, log_id: int, status: str, 
                                tx_id: str = None, error_message: str = None):
-        """更新提币状态"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE withdrawal_logs 
-                SET status = ?, tx_id = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (status, tx_id, error_message, log_id))
-            conn.commit()
+        """更新提币状态(延迟批量写入)"""
+        self.writer.put(UPDATE_WITHDRAWAL_STATUS, (status, tx_id, error_message, log_id))
+    
+    def get_submitted_withdrawals(self) -> List[Dict]:
+        """获取已提交到交易所、尚未确认最终状态的提币记录"""
+        self.writer.flush()
+        return [dict(row) for row in self._fetchall(SELECT_SUBMITTED_WITHDRAWALS)]
+    
+    def apply_withdrawal_transitions(self, transitions: List[Dict]) -> int:
+        """在一个事务中批量更新提币记录的最终状态(只更新仍为SUBMITTED的记录)"""
+        if not transitions:
+            return 0
+        self.writer.flush()
+        with self._transaction() as cursor:
+            cursor.executemany(APPLY_WITHDRAWAL_TRANSITION, transitions)
+            return cursor.rowcount
     
     def get_withdrawal_logs(self, limit: int = 100) -> List[Dict]:
         """获取提币记录"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM withdrawal_logs 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (limit,))
-            return [dict(row) for row in cursor.fetchall()]
+        return self.query_withdrawal_logs(limit)[0]
+    
+    def query_withdrawal_logs(self, limit: int = 100, cursor: str = None, status: str = None,
+                              coin: str = None, network: str = None, address: str = None,
+                              start_time: str = None, end_time: str = None,
+                              batch_id: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        按创建时间倒序分页查询提币记录
+        
+        Args:
+            limit: 每页条数
+            cursor: 上一页返回的游标，为空时从最新记录开始
+            status/coin/network/address/batch_id: 过滤条件
+            start_time/end_time: 创建时间范围(UTC, 'YYYY-MM-DD HH:MM:SS')
+            
+        Returns:
+            (记录列表, 下一页游标)，没有更多记录时游标为None
+        """
+        self.writer.flush()
+        sql, params = keyset_query(
+            'withdrawal_logs', 'created_at',
+            {'status': status, 'coin': coin, 'network': network, 'address': address, 'batch_id': batch_id},
+            cursor, start_time, end_time
+        )
+        rows = [dict(row) for row in self._fetchall(sql, params + [limit])]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if len(rows) == limit else None
+        return rows, next_cursor
+    
+    def iter_withdrawal_logs(self, chunk_size: int = 1000, **filters) -> Iterator[Dict]:
+        """
+        按创建时间倒序逐条产出提币记录，用于导出
+        
+        每次只取chunk_size条，下一块从上一块的游标继续，内存占用与记录总数无关；
+        每块是一次独立的短查询，不会长时间占用读事务阻塞WAL检查点。
+        
+        Args:
+            chunk_size: 每次查询的条数
+            filters: 过滤条件，同query_withdrawal_logs
+        """
+        cursor = None
+        while True:
+            rows, cursor = self.query_withdrawal_logs(chunk_size, cursor=cursor, **filters)
+            yield from rows
+            if cursor is None:
+                return
     
     def add_operation_log(self, operation: str, details: str = None, 
                          status: str = 'SUCCESS', error_message: str = None):
-        """添加操作日志"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO operation_logs (operation, details, status, error_message)
-                VALUES (?, ?, ?, ?)
-            ''', (operation, details, status, error_message))
-            conn.commit()
+        """添加操作日志(延迟批量写入)"""
+        self.writer.put(INSERT_OPERATION_LOG, (operation, details, status, error_message))
     
     def get_operation_logs(self, limit: int = 100) -> List[Dict]:
         """获取操作日志"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM operation_logs 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (limit,))
-            return [dict(row) for row in cursor.fetchall()]
+        return self.query_operation_logs(limit)[0]
+    
+    def query_operation_logs(self, limit: int = 100, cursor: str = None, status: str = None,
+                             operation: str = None, start_time: str = None,
+                             end_time: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """按时间倒序分页查询操作日志，参数和返回值同query_withdrawal_logs"""
+        self.writer.flush()
+        sql, params = keyset_query(
+            'operation_logs', 'timestamp',
+            {'status': status, 'operation': operation},
+            cursor, start_time, end_time
+        )
+        rows = [dict(row) for row in self._fetchall(sql, params + [limit])]
+        next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id']) if len(rows) == limit else None
+        return rows, next_cursor
+    
+    def get_daily_stats(self, days: int = 30, coin: str = None, network: str = None) -> List[Dict]:
+        """
+        从汇总表读取最近若干天按(日期, 币种, 网络)的提币统计，不扫描提币记录表
+        
+        Returns:
+            每项包含 day, coin, network, total, pending, succeeded, completed, failed, cancelled, volume, fees
+            (cancelled为未实际提交的已取消条目，不计入成功率)
+        """
+        self.writer.flush()
+        rows = self._fetchall(
+            SELECT_DAILY_STATS, (f'-{max(int(days), 1) - 1} days', coin, coin, network, network)
+        )
+        return [dict(row) for row in rows]
+    
+    def _load_config(self) -> Dict[str, str]:
+        return {row['key']: row['value'] for row in self._fetchall(SELECT_ALL_CONFIG)}
     
     def save_config(self, key: str, value: str):
         """保存配置"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO app_config (key, value, updated_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            ''', (key, value))
-            conn.commit()
+        self.save_configs({key: value})
+    
+    def save_configs(self, values: Dict[str, str]):
+        """在一个事务中保存多项配置，提交成功后再更新缓存"""
+        with self._config_lock:
+            with self._transaction() as cursor:
+                cursor.executemany(UPSERT_CONFIG, list(values.items()))
+            # 整体替换缓存字典，并发读取要么看到全部旧值，要么看到全部新值
+            self._config = {**self._config, **values}
     
     def get_config(self, key: str) -> Optional[str]:
-        """获取配置"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT value FROM app_config WHERE key = ?', (key,))
-            result = cursor.fetchone()
-            return result[0] if result else None
+        """获取配置(读取内存缓存)"""
+        return self._config.get(key)
+    
+    def upsert_exchange_withdrawals(self, records: List[Dict]) -> int:
+        """批量写入交易所提币记录，已存在的记录更新状态等可变字段"""
+        if not records:
+            return 0
+        with self._transaction() as cursor:
+            cursor.executemany(UPSERT_EXCHANGE_WITHDRAWAL, records)
+            return len(records)
+    
+    def get_exchange_withdrawals(self, coin: str = None, limit: int = 100) -> List[Dict]:
+        """获取本地保存的交易所提币记录"""
+        if coin:
+            rows = self._fetchall(SELECT_EXCHANGE_WITHDRAWALS_BY_COIN, (coin, limit))
+        else:
+            rows = self._fetchall(SELECT_EXCHANGE_WITHDRAWALS, (limit,))
+        return [dict(row) for row in rows]
+    
+    def get_sync_cursor(self, coin: str) -> Optional[int]:
+        """获取币种的同步游标(毫秒时间戳)"""
+        result = self._fetchone(SELECT_SYNC_CURSOR, (coin,))
+        return result[0] if result else None
+    
+    def set_sync_cursor(self, coin: str, value: int):
+        """保存币种的同步游标"""
+        with self._transaction() as cursor:
+            cursor.execute(UPSERT_SYNC_CURSOR, (coin, value))
+    
+    def select_expired_rows(self, table: str, cutoff: str, limit: int) -> List[Dict]:
+        """按ID顺序取出早于cutoff的一批可归档记录"""
+        time_column, condition = RETENTION_TABLES[table]
+        self.writer.flush()
+        rows = self._fetchall(
+            f'SELECT * FROM {table} WHERE {time_column} < ? AND {condition} ORDER BY id LIMIT ?',
+            (cutoff, limit)
+        )
+        return [dict(row) for row in rows]
+    
+    def delete_rows(self, table: str, ids: List[int]) -> int:
+        """在一个短事务中按ID删除一批记录"""
+        if table not in RETENTION_TABLES or not ids:
+            return 0
+        with self._transaction() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({",".join("?" * len(ids))})', ids)
+            return cursor.rowcount
+    
+    def compact(self) -> Dict:
+        """回收删除记录后的空闲页并截断WAL文件"""
+        with self.pool.connection() as conn:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                # 旧数据库需要一次完整VACUUM才能切换到增量回收模式
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('VACUUM')
+            freed = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            conn.execute('PRAGMA incremental_vacuum').fetchall()
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            return {'freed_pages': freed, 'size_bytes': page_count * page_size}
+    
+    def close(self):
+        """写完延迟队列并关闭连接池中的全部连接"""
+        self.writer.close()
+        self.pool.close_all()
@@ -0,0 +1,192 @@
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util import connection as urllib3_connection
+
+from config import Config
+
+
+class DNSCache:
+    """带TTL的DNS解析缓存"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        """解析主机地址，返回IP列表"""
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+        return addresses
+
+    def invalidate(self, host: str, port: int):
+        """连接失败时移除缓存的解析结果"""
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+class _CachedDNSConnectionMixin:
+    """建立新连接时使用共享DNS缓存，并统计新建连接数"""
+
+    transport: 'SharedTransport' = None
+
+    def _new_conn(self):
+        transport = self.transport
+        try:
+            addresses = transport.dns_cache.resolve(self.host, self.port)
+        except socket.gaierror:
+            # 解析失败交给urllib3按原流程处理并抛出对应异常
+            return super()._new_conn()
+
+        last_error = None
+        for address in addresses:
+            try:
+                sock = urllib3_connection.create_connection(
+                    (address, self.port),
+                    self.timeout,
+                    source_address=self.source_address,
+                    socket_options=self.socket_options,
+                )
+                transport.record_connection()
+                return sock
+            except OSError as e:
+                last_error = e
+        transport.dns_cache.invalidate(self.host, self.port)
+        # 与urllib3一致: 连接超时抛出ConnectTimeoutError，请求据此判断为未发出
+        if isinstance(last_error, socket.timeout):
+            raise ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+            ) from last_error
+        raise NewConnectionError(self, f"Failed to establish a new connection: {last_error}") from last_error
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """所有会话共享的连接池适配器
+
+    会话关闭时不会关闭共享连接池，只有shutdown()才会真正释放连接。
+    """
+
+    def __init__(self, transport: 'SharedTransport', **kwargs):
+        self.transport = transport
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.transport.pool_classes
+
+    def send(self, request, **kwargs):
+        self.transport.record_request()
+        return super().send(request, **kwargs)
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class SharedTransport:
+    """进程级共享的HTTP传输层
+
+    所有Binance客户端的会话都挂载同一个连接池适配器，复用长连接和TLS会话，
+    新建连接时使用带TTL的DNS缓存。
+    """
+
+    def __init__(self, pool_connections: int = None, pool_maxsize: int = None, dns_ttl: float = None):
+        self.pool_connections = pool_connections or Config.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or Config.HTTP_POOL_MAXSIZE
+        self.dns_cache = DNSCache(dns_ttl or Config.DNS_CACHE_TTL)
+        self.stats = {'requests': 0, 'connections_created': 0, 'sessions': 0}
+        self._lock = threading.Lock()
+
+        transport = self
+        https_connection = type('HTTPSConnection', (_CachedDNSConnectionMixin, HTTPSConnection), {'transport': transport})
+        http_connection = type('HTTPConnection', (_CachedDNSConnectionMixin, HTTPConnection), {'transport': transport})
+        self.pool_classes = {
+            'http': type('HTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http_connection}),
+            'https': type('HTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https_connection}),
+        }
+        self.adapter = PooledHTTPAdapter(
+            self,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=False
+        )
+
+    def create_session(self, headers: Optional[Dict] = None) -> requests.Session:
+        """创建挂载共享连接池的会话(会话本身只保存请求头等轻量状态)"""
+        session = requests.Session()
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        if headers:
+            session.headers.update(headers)
+        with self._lock:
+            self.stats['sessions'] += 1
+        return session
+
+    def record_request(self):
+        with self._lock:
+            self.stats['requests'] += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.stats['connections_created'] += 1
+
+    def get_stats(self) -> Dict:
+        """获取连接池统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        requests_count = stats['requests']
+        reused = max(0, requests_count - stats['connections_created'])
+        pools = self.adapter.poolmanager.pools
+        idle = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None and pool.pool is not None:
+                # 队列中预先填充了None占位，只统计真正空闲的连接
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        stats.update({
+            'connections_reused': reused,
+            'reuse_ratio': round(reused / requests_count, 4) if requests_count else 0.0,
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'active_pools': len(pools),
+            'idle_connections': idle,
+            'dns_cache_hits': self.dns_cache.hits,
+            'dns_cache_misses': self.dns_cache.misses
+        })
+        return stats
+
+
+_transport: Optional[SharedTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> SharedTransport:
+    """获取进程级共享的传输层"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = SharedTransport()
+        return _transport
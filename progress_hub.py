@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Optional
+
+from config import Config
+from task_runner import TASK_TYPES
+
+PROGRESS_EVENTS = {kind['progress'] for kind in TASK_TYPES.values()}
+FINAL_EVENTS = {kind['complete'] for kind in TASK_TYPES.values()} | {kind['error'] for kind in TASK_TYPES.values()}
+PAUSED_EVENTS = {kind['paused'] for kind in TASK_TYPES.values() if kind['paused']}
+RESUMED_EVENTS = {kind['resumed'] for kind in TASK_TYPES.values() if kind['resumed']}
+
+
+def task_room(task_id: str) -> str:
+    """任务对应的Socket.IO房间名"""
+    return f'task:{task_id}'
+
+
+class ProgressHub:
+    """任务进度推送
+
+    任务事件只发送到订阅了该任务的房间。逐条目的进度事件先合并在内存中，每隔固定时间
+    为有变化的任务发送一帧，包含最新计数和本帧内最近处理的条目；开始、等待等事件直接
+    发送。完成和出错事件发送前先把该任务未发出的进度帧发出，保证最终汇总在最后一帧之后。
+
+    每次向任务房间发送事件或进度帧时递增该任务和全局的版本号，供REST接口生成ETag和
+    长轮询等待；版本号按帧递增，轮询方的唤醒频率与推送频率相同。任务结束PROGRESS_VERSION_TTL
+    秒后释放其版本号，之后带旧ETag的轮询立即返回并改用新的ETag。
+    """
+
+    def __init__(self, socketio, db, interval_ms: float = None, frame_items: int = None,
+                 version_ttl: float = None):
+        """
+        Args:
+            socketio: SocketIO实例
+            db: DatabaseManager实例，订阅已结束的任务时从中读取汇总
+            interval_ms: 进度帧的发送间隔(毫秒)
+            frame_items: 每帧最多携带的条目数
+            version_ttl: 任务结束后保留版本号的秒数
+        """
+        self.socketio = socketio
+        self.db = db
+        self.interval = (interval_ms or Config.PROGRESS_FRAME_INTERVAL_MS) / 1000
+        self.frame_items = frame_items or Config.PROGRESS_FRAME_ITEMS
+        self.stats = {'events': 0, 'frames': 0}
+        self._tasks: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        # 收集和发送进度帧在同一把锁内完成，定时发送的帧不会落在最终汇总之后
+        self._emit_lock = threading.RLock()
+        self._thread = None
+        # 版本号只在本进程内有效，ETag中带上进程标识，重启后旧的ETag不会误匹配
+        self.epoch = uuid.uuid4().hex[:8]
+        self._versions: Dict[str, int] = {}
+        self._version = 0
+        self.version_ttl = Config.PROGRESS_VERSION_TTL if version_ttl is None else version_ttl
+        # (释放时间, 任务ID)，保留时间固定，按结束顺序即按释放时间排列
+        self._expiring = deque()
+        self._changed = threading.Condition()
+        self.logger = logging.getLogger(__name__)
+
+    def _state(self, task_id: str) -> Dict:
+        state = self._tasks.get(task_id)
+        if state is None:
+            state = {
+                'task_id': task_id,
+                'status': 'PROCESSING',
+                'total': 0,
+                'completed': 0,
+                'failed': 0,
+                'current': 0,
+                'event': None,
+                'items': deque(maxlen=self.frame_items),
+                'pending': 0
+            }
+            self._tasks[task_id] = state
+        return state
+
+    def emit(self, event: str, data: Dict):
+        """推送任务事件，签名与SocketIO.emit一致，可直接作为任务执行器的回调"""
+        task_id = data.get('task_id')
+        if task_id is None:
+            self.socketio.emit(event, data)
+            return
+
+        if event in PROGRESS_EVENTS:
+            with self._lock:
+                self.stats['events'] += 1
+                state = self._state(task_id)
+                state['event'] = event
+                state['total'] = data.get('total', state['total'])
+                state['completed'] = data.get('completed', state['completed'])
+                state['failed'] = data.get('failed', state['failed'])
+                state['current'] = max(state['current'], data.get('current', 0))
+                state['items'].append({key: value for key, value in data.items()
+                                       if key not in ('task_id', 'total', 'completed', 'failed')})
+                state['pending'] += 1
+            self._start()
+            return
+
+        with self._emit_lock:
+            if event in FINAL_EVENTS:
+                self._flush(task_id)
+                with self._lock:
+                    self._tasks.pop(task_id, None)
+            else:
+                with self._lock:
+                    state = self._state(task_id)
+                    state['total'] = data.get('total', state['total'])
+                    if event in PAUSED_EVENTS:
+                        state['status'] = 'PAUSED'
+                    elif event in RESUMED_EVENTS:
+                        state['status'] = 'PROCESSING'
+            self.socketio.emit(event, data, to=task_room(task_id))
+            self.touch(task_id, final=event in FINAL_EVENTS)
+
+    def _frame(self, state: Dict) -> Dict:
+        frame = {
+            'task_id': state['task_id'],
+            'total': state['total'],
+            'completed': state['completed'],
+            'failed': state['failed'],
+            'current': state['current'],
+            'items': list(state['items']),
+            # 本帧合并的条目事件数，超过items长度的部分只体现在计数中
+            'coalesced': state['pending']
+        }
+        state['items'].clear()
+        state['pending'] = 0
+        return frame
+
+    def _flush(self, task_id: str = None):
+        """发送有未推送进度的任务(为空时为全部任务)的进度帧"""
+        with self._emit_lock:
+            with self._lock:
+                if task_id is None:
+                    states = list(self._tasks.values())
+                else:
+                    states = [self._tasks[task_id]] if task_id in self._tasks else []
+                frames = [(state['event'], self._frame(state)) for state in states if state['pending']]
+                self.stats['frames'] += len(frames)
+            for event, frame in frames:
+                self.socketio.emit(event, frame, to=task_room(frame['task_id']))
+                self.touch(frame['task_id'])
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._flush()
+            except Exception as e:
+                self.logger.error(f"推送进度帧失败: {str(e)}")
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='progress-hub')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def touch(self, task_id: str, final: bool = False):
+        """标记任务已变化，唤醒等待中的长轮询；final为True时任务已结束，版本号到期后释放"""
+        with self._changed:
+            now = time.monotonic()
+            while self._expiring and self._expiring[0][0] <= now:
+                self._versions.pop(self._expiring.popleft()[1], None)
+            self._versions[task_id] = self._versions.get(task_id, 0) + 1
+            self._version += 1
+            if final:
+                self._expiring.append((now + self.version_ttl, task_id))
+            self._changed.notify_all()
+
+    def version(self, task_id: str = None) -> int:
+        """任务(为空时为全部任务)的当前版本号"""
+        with self._changed:
+            return self._version if task_id is None else self._versions.get(task_id, 0)
+
+    def wait_for_change(self, task_id: Optional[str], version: int, timeout: float) -> int:
+        """等待版本号不再等于version或超时，返回最新版本号"""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: (self._version if task_id is None else self._versions.get(task_id, 0)) != version,
+                timeout
+            )
+            return self._version if task_id is None else self._versions.get(task_id, 0)
+
+    def snapshot(self, task_id: str) -> Optional[Dict]:
+        """任务当前进度(新订阅者先收到一次)，任务不存在时返回None"""
+        with self._lock:
+            state = self._tasks.get(task_id)
+            if state is not None:
+                return {key: state[key] for key in ('task_id', 'status', 'total', 'completed', 'failed', 'current')}
+        task = self.db.get_batch_task(task_id)
+        if task is None:
+            return None
+        return {
+            'task_id': task_id,
+            'status': task['status'],
+            'total': task['total'],
+            'completed': task['completed'],
+            'failed': task['failed'],
+            'current': task['checkpoint']
+        }
+
+    def get_stats(self) -> Dict:
+        """获取推送统计(合并前的事件数和实际发送的帧数)"""
+        with self._changed:
+            tracked = len(self._versions)
+        with self._lock:
+            return {**self.stats, 'active_tasks': len(self._tasks), 'tracked_versions': tracked}
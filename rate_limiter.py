@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config import Config
+
+# 各接口的请求权重(按路径后缀匹配)，未列出的接口按1计
+ENDPOINT_WEIGHTS = {
+    'account': 20,
+    'capital/config/getall': 10,
+    'capital/deposit/address': 10,
+    'capital/withdraw/history': 1,
+    'capital/withdraw/apply': 1,
+    'ping': 1,
+    'time': 1,
+}
+
+# 提币类接口，其余接口均归为读取类
+WITHDRAW_ENDPOINTS = ('capital/withdraw/apply',)
+
+
+def classify_endpoint(uri: str) -> Tuple[str, int]:
+    """根据请求地址判断接口类别和权重"""
+    path = uri.split('?', 1)[0].rstrip('/')
+    endpoint_class = 'withdraw' if path.endswith(WITHDRAW_ENDPOINTS) else 'read'
+    for suffix, weight in ENDPOINT_WEIGHTS.items():
+        if path.endswith('/' + suffix):
+            return endpoint_class, weight
+    return endpoint_class, 1
+
+
+class TokenBucket:
+    """令牌桶
+
+    允许令牌数暂时为负: 每次预约都立即扣除令牌，并返回需要等待的时间，
+    多个线程据此自然排队，不需要循环重试。
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        """
+        Args:
+            capacity: 桶容量(最大突发量)
+            refill_rate: 每秒补充的令牌数
+        """
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+
+    def reserve(self, cost: float, now: float) -> float:
+        """预约令牌，返回需要等待的秒数"""
+        self._refill(now)
+        self.tokens -= min(float(cost), self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.refill_rate
+
+    def drain(self, now: float):
+        """清空令牌(服务端提示额度紧张时使用)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class RateLimitScheduler:
+    """基于令牌桶和服务端限频响应头的请求调度器
+
+    每个接口类别(提币/读取)一个令牌桶控制本地发送节奏；同时读取服务端返回的
+    已用权重/下单计数响应头，当同一API Key被其他会话占用导致额度接近上限时，
+    暂停派发直到当前统计窗口结束。
+    """
+
+    def __init__(self, buckets: Dict[str, Tuple[float, float]] = None,
+                 header_limits: Dict[str, int] = None, safety_ratio: float = None):
+        buckets = buckets or Config.RATE_LIMIT_BUCKETS
+        self.buckets = {name: TokenBucket(capacity, rate) for name, (capacity, rate) in buckets.items()}
+        self.header_limits = {k.lower(): v for k, v in (header_limits or Config.RATE_LIMIT_HEADER_LIMITS).items()}
+        self.safety_ratio = safety_ratio or Config.RATE_LIMIT_SAFETY_RATIO
+        self.blocked_until = 0.0
+        self.used = {}
+        self.stats = {'requests': 0, 'throttled': 0, 'wait_seconds': 0.0, 'rejected': 0}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def reserve(self, endpoint_class: str, weight: int = 1) -> float:
+        """预约一次请求的额度，返回发送前需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            bucket = self.buckets.get(endpoint_class) or self.buckets['read']
+            wait = max(bucket.reserve(weight, now), self.blocked_until - now)
+            self.stats['requests'] += 1
+            if wait > 0:
+                self.stats['throttled'] += 1
+                self.stats['wait_seconds'] += wait
+        return wait
+
+    def acquire(self, endpoint_class: str, weight: int = 1):
+        """阻塞直到额度允许发送该请求"""
+        wait = self.reserve(endpoint_class, weight)
+        if wait > 0:
+            time.sleep(wait)
+
+    def observe(self, response):
+        """根据requests响应更新调度状态"""
+        if response is None:
+            return
+        self.observe_status(response.status_code, response.headers)
+
+    def observe_status(self, status_code: int, headers):
+        """根据响应状态码和限频响应头更新调度状态"""
+        now = time.monotonic()
+        headers = headers or {}
+        block_for = 0.0
+
+        if status_code in (418, 429):
+            retry_after = headers.get('Retry-After')
+            try:
+                block_for = float(retry_after) if retry_after else 60.0
+            except ValueError:
+                block_for = 60.0
+            self.logger.warning(f"触发Binance限频 (HTTP {status_code})，暂停派发 {block_for:.0f} 秒")
+
+        for key, value in headers.items():
+            key = key.lower()
+            limit = self.header_limits.get(key)
+            if not limit:
+                continue
+            try:
+                used = int(value)
+            except (TypeError, ValueError):
+                continue
+            self.used[key] = used
+            if used >= limit * self.safety_ratio:
+                block_for = max(block_for, self._window_remaining(key))
+
+        if block_for > 0:
+            with self._lock:
+                if status_code in (418, 429):
+                    self.stats['rejected'] += 1
+                self.blocked_until = max(self.blocked_until, now + block_for)
+                for bucket in self.buckets.values():
+                    bucket.drain(now)
+
+    @staticmethod
+    def _window_remaining(header: str) -> float:
+        """计算响应头对应统计窗口(如 1m / 10s / 1d)的剩余秒数"""
+        interval = header.rsplit('-', 1)[-1]
+        units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+        try:
+            seconds = int(interval[:-1]) * units[interval[-1]]
+        except (ValueError, KeyError, IndexError):
+            return 1.0
+        # Binance的统计窗口按整点对齐
+        return seconds - (time.time() % seconds)
+
+    def get_stats(self) -> Dict:
+        """获取调度统计"""
+        with self._lock:
+            return {
+                **self.stats,
+                'used': dict(self.used),
+                'blocked_for': max(0.0, self.blocked_until - time.monotonic())
+            }
+
+
+_schedulers: Dict[str, RateLimitScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(api_key: Optional[str]) -> RateLimitScheduler:
+    """获取API Key对应的调度器，同一Key的所有客户端共享额度"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(api_key or '')
+        if scheduler is None:
+            scheduler = RateLimitScheduler()
+            _schedulers[api_key or ''] = scheduler
+        return scheduler
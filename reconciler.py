@@ -0,0 +1,152 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from history_sync import DAY_MS, fetch_history, parse_apply_time, to_row
+
+# 交易所提币状态 -> 本地记录的最终状态，未列出的状态(处理中)保持SUBMITTED
+FINAL_STATUSES = {
+    6: 'COMPLETED',
+    1: 'CANCELLED',
+    3: 'FAILED',
+    5: 'FAILED'
+}
+STATUS_MESSAGES = {
+    1: '提币已取消',
+    3: '提币被拒绝',
+    5: '提币失败'
+}
+# 超过对账期限仍未确认的记录
+UNCONFIRMED_STATUS = 'UNCONFIRMED'
+UNCONFIRMED_MESSAGE = '超过对账期限仍未确认，请人工核对'
+
+
+class WithdrawalReconciler:
+    """提币状态对账
+
+    定期取出状态为SUBMITTED的本地记录，按币种分组，每个币种用一次覆盖全部记录时间范围的
+    历史查询获取交易所状态，按提币ID匹配后在一个事务中更新最终状态。
+    轮询开销与币种数量相关，与进行中的提币笔数无关。查询范围最多回溯RECONCILE_MAX_AGE_DAYS天，
+    更早提交仍未确认的记录不再查询，标记为UNCONFIRMED并记录操作日志，由人工核对。
+    """
+
+    def __init__(self, db, get_client: Callable[[], Optional[object]],
+                 emit: Callable[[str, Dict], None] = None, interval: float = None):
+        """
+        Args:
+            db: DatabaseManager实例
+            get_client: 返回当前BinanceWithdrawalClient(未配置时返回None)
+            emit: 推送事件的回调(事件名, 数据)
+            interval: 轮询间隔秒数
+        """
+        self.db = db
+        self.get_client = get_client
+        self.emit = emit
+        self.interval = interval or Config.RECONCILE_INTERVAL
+        self.window = Config.HISTORY_SYNC_WINDOW_DAYS * DAY_MS - 1
+        self.max_age = Config.RECONCILE_MAX_AGE_DAYS * DAY_MS
+        self.page_size = Config.HISTORY_SYNC_PAGE_SIZE
+        self._stop = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def reconcile_once(self, client) -> List[Dict]:
+        """执行一次对账，返回本次更新的记录"""
+        outstanding = self.db.get_submitted_withdrawals()
+        if not outstanding:
+            return []
+
+        now = int(time.time() * 1000)
+        cutoff = now - self.max_age
+        transitions = []
+        exchange_rows = []
+        by_coin: Dict[str, List[Dict]] = {}
+        for row in outstanding:
+            if parse_apply_time(row['created_at']) < cutoff:
+                transitions.append({
+                    'id': row['id'],
+                    'status': UNCONFIRMED_STATUS,
+                    'chain_tx_id': None,
+                    'fee': row['fee'],
+                    'error_message': UNCONFIRMED_MESSAGE,
+                    'row': row
+                })
+                continue
+            by_coin.setdefault(row['coin'], []).append(row)
+
+        for coin, rows in by_coin.items():
+            # created_at为本地写入时间(UTC)，向前留出余量覆盖两端时钟差
+            start = min(parse_apply_time(row['created_at']) for row in rows) - Config.HISTORY_SYNC_OVERLAP * 1000
+            try:
+                items = fetch_history(client, coin, max(start, 0), now, self.window, self.page_size)
+            except Exception as e:
+                self.logger.error(f"查询{coin}提币状态失败: {str(e)}")
+                continue
+
+            exchange_rows.extend(to_row(item) for item in items)
+            by_id = {str(item.get('id')): item for item in items}
+            for row in rows:
+                item = by_id.get(str(row['tx_id']))
+                if item is None:
+                    continue
+                try:
+                    status = int(item.get('status'))
+                except (TypeError, ValueError):
+                    continue
+                if status not in FINAL_STATUSES:
+                    continue
+                transitions.append({
+                    'id': row['id'],
+                    'status': FINAL_STATUSES[status],
+                    'chain_tx_id': item.get('txId') or None,
+                    'fee': float(item.get('transactionFee', 0)),
+                    'error_message': STATUS_MESSAGES.get(status),
+                    'row': row
+                })
+
+        self.db.upsert_exchange_withdrawals(exchange_rows)
+        self.db.apply_withdrawal_transitions(transitions)
+
+        for transition in transitions:
+            row = transition['row']
+            if transition['status'] == UNCONFIRMED_STATUS:
+                self.logger.warning(f"提币超过对账期限仍未确认: {row['coin']} {row['amount']} -> {row['address']}, "
+                                    f"提币ID: {row['tx_id']}")
+                self.db.add_operation_log('提币对账', f"{row['coin']} {row['amount']} -> {row['address']}, "
+                                                     f"提币ID: {row['tx_id']}", 'ERROR', UNCONFIRMED_MESSAGE)
+            else:
+                self.logger.info(f"提币状态更新: {row['coin']} {row['amount']} -> {row['address']}, {transition['status']}")
+            if self.emit:
+                self.emit('withdrawal_update', {
+                    'log_id': row['id'],
+                    'status': transition['status'],
+                    'tx_id': row['tx_id'],
+                    'chain_tx_id': transition['chain_tx_id'],
+                    'message': f"{row['coin']} {row['amount']} -> {row['address']}: {transition['status']}"
+                })
+        return transitions
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            client = self.get_client()
+            if client is None:
+                continue
+            try:
+                self.reconcile_once(client)
+            except Exception as e:
+                self.logger.error(f"提币状态对账失败: {str(e)}")
+
+    def start(self):
+        """启动后台对账线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='withdrawal-reconciler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止后台对账线程"""
+        self._stop.set()
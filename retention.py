@@ -0,0 +1,158 @@
+import gzip
+import heapq
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from config import Config
+from database import RETENTION_TABLES
+
+
+class RetentionManager:
+    """日志保留与归档
+
+    把超过保留天数的操作日志和已结束的提币记录按日期追加到压缩归档文件
+    (<归档目录>/<表名>/<YYYY-MM-DD>.ndjson.gz)，再分批用短事务删除，最后增量回收空闲页。
+    先写归档再删除，中途中断只会在归档中留下重复记录，读取时按ID去重。
+    """
+
+    def __init__(self, db, archive_dir: str = None, retention_days: int = None,
+                 chunk_size: int = None, interval: float = None):
+        """
+        Args:
+            db: DatabaseManager实例
+            archive_dir: 归档目录
+            retention_days: 数据库中保留的天数
+            chunk_size: 每批归档/删除的记录数
+            interval: 后台执行间隔秒数
+        """
+        self.db = db
+        self.archive_dir = archive_dir or Config.ARCHIVE_DIR
+        self.retention_days = retention_days or Config.RETENTION_DAYS
+        self.chunk_size = chunk_size or Config.RETENTION_CHUNK_SIZE
+        self.interval = interval or Config.RETENTION_INTERVAL
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def _archive_path(self, table: str, day: str) -> str:
+        return os.path.join(self.archive_dir, table, f'{day}.ndjson.gz')
+
+    def _write_archive(self, table: str, rows: List[Dict]):
+        """按日期分组追加到归档文件(gzip支持多段追加)"""
+        time_column = RETENTION_TABLES[table][0]
+        by_day: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_day.setdefault(str(row[time_column])[:10], []).append(row)
+
+        os.makedirs(os.path.join(self.archive_dir, table), exist_ok=True)
+        for day, day_rows in by_day.items():
+            with open(self._archive_path(table, day), 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+                    for row in day_rows:
+                        archive.write(json.dumps(row, ensure_ascii=False).encode() + b'\n')
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    def archive_table(self, table: str, cutoff: str) -> int:
+        """归档并删除一张表中早于cutoff的记录，返回处理的条数"""
+        total = 0
+        while True:
+            rows = self.db.select_expired_rows(table, cutoff, self.chunk_size)
+            if not rows:
+                return total
+            self._write_archive(table, rows)
+            self.db.delete_rows(table, [row['id'] for row in rows])
+            total += len(rows)
+
+    def run(self) -> Dict:
+        """执行一次归档，返回各表归档条数和回收结果"""
+        if not self._run_lock.acquire(blocking=False):
+            return {'skipped': True}
+        try:
+            cutoff = (datetime.utcnow() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+            result = {'cutoff': cutoff, 'archived': {}, 'skipped': False}
+            for table in RETENTION_TABLES:
+                result['archived'][table] = self.archive_table(table, cutoff)
+            result.update(self.db.compact())
+            self.logger.info(f"日志归档完成: {result['archived']}, 截止时间: {cutoff}")
+            return result
+        finally:
+            self._run_lock.release()
+
+    def _iter_archive(self, table: str, start_day: date, end_day: date) -> Iterator[Dict]:
+        day = start_day
+        while day <= end_day:
+            path = self._archive_path(table, day.isoformat())
+            if os.path.exists(path):
+                with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                    for line in archive:
+                        if line.strip():
+                            yield json.loads(line)
+            day += timedelta(days=1)
+
+    def read_archive(self, table: str, start_day: str, end_day: str = None,
+                     filters: Optional[Dict] = None, limit: int = 1000) -> List[Dict]:
+        """
+        查询归档中的记录
+
+        Args:
+            table: 表名
+            start_day: 开始日期 YYYY-MM-DD
+            end_day: 结束日期(含)，默认与开始日期相同，跨度不超过ARCHIVE_QUERY_MAX_DAYS天
+            filters: 等值过滤条件 字段 -> 值
+            limit: 最多返回条数
+
+        Returns:
+            按ID倒序的记录列表
+        """
+        if table not in RETENTION_TABLES:
+            raise ValueError(f"不支持的归档表: {table}")
+        start = date.fromisoformat(start_day)
+        end = date.fromisoformat(end_day) if end_day else start
+        if end < start:
+            raise ValueError("结束日期不能早于开始日期")
+        if (end - start).days + 1 > Config.ARCHIVE_QUERY_MAX_DAYS:
+            raise ValueError(f"查询范围不能超过{Config.ARCHIVE_QUERY_MAX_DAYS}天")
+        filters = {k: v for k, v in (filters or {}).items() if v is not None}
+
+        # 流式读取，只在小顶堆中保留ID最大的limit条，重复ID以后读到的为准
+        heap: List[int] = []
+        rows: Dict[int, Dict] = {}
+        for row in self._iter_archive(table, start, end):
+            if not all(row.get(k) == v for k, v in filters.items()):
+                continue
+            row_id = row['id']
+            if row_id in rows:
+                rows[row_id] = row
+            elif len(heap) < limit:
+                heapq.heappush(heap, row_id)
+                rows[row_id] = row
+            elif heap and row_id > heap[0]:
+                del rows[heapq.heapreplace(heap, row_id)]
+                rows[row_id] = row
+        return [rows[row_id] for row_id in sorted(rows, reverse=True)]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run()
+            except Exception as e:
+                self.logger.error(f"日志归档失败: {str(e)}")
+
+    def start(self):
+        """启动后台归档线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='log-retention')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止后台归档线程"""
+        self._stop.set()
@@ -0,0 +1,70 @@
+import random
+import uuid
+from typing import Optional, Tuple
+
+import requests
+from binance.exceptions import BinanceAPIException
+
+from config import Config
+
+# 可重试的Binance错误码
+#   -1001 内部连接断开(执行状态未知)  -1003 请求过多  -1007 等待后端响应超时(执行状态未知)
+#   -1015 下单过多  -1021 时间戳超出recvWindow
+RETRYABLE_CODES = (-1001, -1003, -1007, -1015, -1021)
+# 请求可能已被执行的错误码，重试前需要先按withdrawOrderId确认
+AMBIGUOUS_CODES = (-1001, -1007)
+
+
+def generate_withdraw_order_id() -> str:
+    """生成客户端提币ID，同一笔提币的所有重试使用同一个ID"""
+    return uuid.uuid4().hex
+
+
+def _retry_after(response) -> Optional[float]:
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def classify_error(error: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    判断异常是否可重试
+
+    Returns:
+        (是否可重试, 请求是否可能已被执行, 服务端要求的等待秒数)
+    """
+    if isinstance(error, BinanceAPIException):
+        status_code = error.status_code or 0
+        retry_after = _retry_after(getattr(error, 'response', None))
+        if status_code in (418, 429):
+            return True, False, retry_after
+        if status_code >= 500:
+            return True, True, retry_after
+        if error.code in RETRYABLE_CODES:
+            return True, error.code in AMBIGUOUS_CODES, retry_after
+        return False, False, None
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        # 连接未建立，请求一定没有发出
+        return True, False, None
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True, True, None
+    return False, False, None
+
+
+class RetryPolicy:
+    """指数退避重试策略(全抖动)，服务端给出Retry-After时以其为准"""
+
+    def __init__(self, max_attempts: int = None, base_delay: float = None, max_delay: float = None):
+        self.max_attempts = max_attempts or Config.RETRY_MAX_ATTEMPTS
+        self.base_delay = base_delay or Config.RETRY_BASE_DELAY
+        self.max_delay = max_delay or Config.RETRY_MAX_DELAY
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """第attempt次(从1开始)失败后需要等待的秒数"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
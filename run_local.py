@@ -43,7 +43,9 @@ def main():
     print()
     
     # 启动应用
-    from app import socketio, app
+    import signal
+    from app import socketio, app, handle_sigterm
+    signal.signal(signal.SIGTERM, handle_sigterm)
     socketio.run(app, debug=True, host='0.0.0.0', port=8888)
 
 if __name__ == '__main__':
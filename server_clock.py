@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict
+
+from config import Config
+from http_transport import get_transport
+
+
+class ServerClock:
+    """交易所服务器时间跟踪
+
+    以请求往返的中点估算本机与服务器的时间差，用指数加权平均平滑后应用到每个签名请求的
+    timestamp；同时跟踪往返延迟，据此选择recvWindow。后台线程定期刷新，收到时间戳错误
+    (-1021)时立即重新同步，之后的重试使用新的时间差。
+    """
+
+    def __init__(self, base_url: str, fetch: Callable[[], int] = None):
+        """
+        Args:
+            base_url: API根地址(如 https://api.binance.com/api)
+            fetch: 获取服务器时间(毫秒)的函数，默认通过共享连接池请求 /v3/time
+        """
+        self.base_url = base_url
+        self.offset = 0.0
+        self.rtt = None
+        self.samples = 0
+        self.synced_at = 0.0
+        self._reset = False
+        self._fetch = fetch or self._fetch_server_time
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def _fetch_server_time(self) -> int:
+        session = get_transport().create_session()
+        response = session.get(f"{self.base_url}/v3/time", timeout=10)
+        response.raise_for_status()
+        return response.json()['serverTime']
+
+    def observe(self, server_time: int, sent_at: float, received_at: float):
+        """记录一次服务器时间采样(时间均为毫秒)"""
+        rtt = max(0.0, received_at - sent_at)
+        offset = server_time - (sent_at + received_at) / 2
+        alpha = Config.CLOCK_EWMA_ALPHA
+        with self._lock:
+            if self.samples == 0 or self._reset:
+                # 首次采样或出现时间戳错误后，直接采用新的测量值
+                self.offset = offset
+                self.rtt = rtt
+                self._reset = False
+            else:
+                self.offset += alpha * (offset - self.offset)
+                self.rtt += alpha * (rtt - self.rtt)
+            self.samples += 1
+            self.synced_at = time.monotonic()
+
+    def sync(self, fetch: Callable[[], int] = None, samples: int = None) -> bool:
+        """
+        采样若干次服务器时间，取往返延迟最小的一次更新时间差
+
+        Args:
+            fetch: 获取服务器时间(毫秒)的函数，默认使用构造时提供的函数
+            samples: 采样次数，默认CLOCK_SYNC_SAMPLES；请求路径上只采样一次
+        """
+        fetch = fetch or self._fetch
+        best = None
+        for _ in range(samples or Config.CLOCK_SYNC_SAMPLES):
+            try:
+                sent_at = time.time() * 1000
+                server_time = fetch()
+                received_at = time.time() * 1000
+            except Exception as e:
+                self.logger.warning(f"同步服务器时间失败: {str(e)}")
+                break
+            if best is None or received_at - sent_at < best[2] - best[1]:
+                best = (server_time, sent_at, received_at)
+        if best is None:
+            return False
+        self.observe(*best)
+        return True
+
+    def recv_window(self) -> int:
+        """根据观测到的往返延迟选择recvWindow(毫秒)"""
+        rtt = self.rtt or 0.0
+        window = Config.RECV_WINDOW_MIN + Config.RECV_WINDOW_LATENCY_FACTOR * rtt
+        return int(min(Config.RECV_WINDOW_MAX, window))
+
+    def timestamp(self) -> int:
+        """当前的服务器时间估计值(毫秒)"""
+        return int(time.time() * 1000 + self.offset)
+
+    def resync(self):
+        """收到时间戳错误时立即重新同步，并发的调用只同步一次"""
+        with self._sync_lock:
+            if time.monotonic() - self.synced_at < 1:
+                return
+            with self._lock:
+                self._reset = True
+            self.sync()
+
+    def _run(self):
+        # 启动后立即做一次多次采样，不等第一个刷新间隔
+        while True:
+            self.sync()
+            time.sleep(Config.CLOCK_SYNC_INTERVAL)
+
+    def start(self):
+        """启动后台刷新线程"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='server-clock')
+            self._thread.daemon = True
+            self._thread.start()
+
+
+_clocks: Dict[str, ServerClock] = {}
+_clocks_lock = threading.Lock()
+
+
+def get_server_clock(base_url: str) -> ServerClock:
+    """获取API根地址对应的服务器时钟，同一地址的所有客户端共享一个后台刷新线程"""
+    with _clocks_lock:
+        clock = _clocks.get(base_url)
+        if clock is None:
+            clock = ServerClock(base_url)
+            clock.start()
+            _clocks[base_url] = clock
+        return clock
@@ -46,6 +46,25 @@ function initializeApp() {
         );
         refreshWithdrawalHistory();
     });
+
+    // 任务进度(只有订阅了该任务才会收到，进度按帧合并推送)
+    socket.on('task_snapshot', function(data) {
+        addLogEntry('info', `任务 ${data.task_id}: ${data.status}，已处理 ${data.completed + data.failed}/${data.total}`, new Date().toISOString());
+    });
+
+    socket.on('smart_withdrawal_progress', function(data) {
+        addLogEntry('info', `任务 ${data.task_id}: 成功 ${data.completed}，失败 ${data.failed}，进度 ${data.current}/${data.total}`, new Date().toISOString());
+    });
+
+    socket.on('smart_withdrawal_complete', function(data) {
+        addLogEntry('success', data.message, new Date().toISOString());
+        socket.emit('unsubscribe_task', { task_id: data.task_id });
+        refreshWithdrawalHistory();
+    });
+
+    socket.on('smart_withdrawal_error', function(data) {
+        addLogEntry('error', data.message, new Date().toISOString());
+    });
 }
 
 // 设置事件监听器
@@ -507,6 +526,7 @@ async function executeSmartWithdrawal(config) {
 
         if (data.success) {
             showAlert(`智能提币任务已启动，任务ID: ${data.task_id}`, 'success');
+            socket.emit('subscribe_task', { task_id: data.task_id });
             document.getElementById('withdrawal-form').reset();
             updateNetworkOptions(); // 重置网络选项
 
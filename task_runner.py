@@ -0,0 +1,496 @@
+import logging
+import random
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from async_binance_client import get_bridge
+from batch_engine import AsyncBatchWithdrawalEngine, BatchWithdrawalEngine
+from bounded_executor import BoundedExecutor
+from config import Config
+from history_sync import DAY_MS, fetch_history, parse_apply_time
+from timer_scheduler import TimerScheduler
+
+# 任务类型 -> 名称和推送的事件名
+TASK_TYPES = {
+    'BATCH': {
+        'label': '批量提币',
+        'start': 'batch_update',
+        'progress': 'batch_progress',
+        'waiting': None,
+        'paused': None,
+        'resumed': None,
+        'complete': 'batch_complete',
+        'error': 'batch_error'
+    },
+    'SMART': {
+        'label': '智能提币',
+        'start': 'smart_withdrawal_start',
+        'progress': 'smart_withdrawal_progress',
+        'waiting': 'smart_withdrawal_waiting',
+        'paused': 'smart_withdrawal_paused',
+        'resumed': 'smart_withdrawal_resumed',
+        'complete': 'smart_withdrawal_complete',
+        'error': 'smart_withdrawal_error'
+    }
+}
+
+
+def item_result(item: Dict) -> Tuple[str, str, Optional[str]]:
+    """已处理条目的结果(状态, 消息, 提币ID)"""
+    if item['status'] == 'FAILED' and not item['tx_id']:
+        return 'FAILED', item['error_message'] or '提币失败', None
+    return 'SUCCESS', '提币已提交', item['tx_id']
+
+
+class TaskExecution:
+    """一个任务本次执行的状态: 剩余条目、计数、余额快照，以及智能提币的调度状态"""
+
+    def __init__(self, runner: 'BatchTaskRunner', binance_client, task: Dict, items: List[Dict]):
+        self.runner = runner
+        self.binance_client = binance_client
+        self.task = task
+        self.task_id = task['id']
+        self.kind = TASK_TYPES[task['task_type']]
+        self.remaining = items[task['checkpoint']:]
+        self.counts = {'completed': task['completed'], 'failed': task['failed']}
+        self.submitted: Dict[str, Dict] = {}
+        self.balance = None
+        # 智能提币的调度状态: scheduled/running/paused/cancelled/done，
+        # 执行中收到的暂停/取消请求记在requested中，当前条目处理完后生效
+        self.lock = threading.Lock()
+        self.position = 0
+        self.state = 'running'
+        self.requested = None
+        self.handle = None
+        self.due = 0.0
+        self.delay = 0.0
+
+    def settled(self, item: Dict) -> Optional[Tuple[str, str, Optional[str]]]:
+        """中断前已有结果或已在交易所提交的条目返回其结果，需要提交时返回None"""
+        if item['status'] != 'PENDING':
+            return item_result(item)
+        existing = self.submitted.get(item['withdraw_order_id'])
+        if existing is not None:
+            tx_id = str(existing.get('id'))
+            self.runner.db.update_withdrawal_status(item['id'], 'SUBMITTED', tx_id)
+            return 'SUCCESS', '中断前已提交', tx_id
+        return None
+
+    def _withdraw_args(self, item: Dict) -> Dict:
+        return {
+            'coin': self.task['coin'],
+            'address': item['address'],
+            'amount': item['amount'],
+            'network': self.task['network'],
+            'address_tag': item['address_tag'],
+            'balance': self.balance,
+            'withdraw_order_id': item['withdraw_order_id']
+        }
+
+    def _apply(self, item: Dict, success: bool, message: str, tx_id: Optional[str]) -> Tuple[str, str, Optional[str]]:
+        """按提交结果更新条目状态"""
+        if success:
+            self.runner.db.update_withdrawal_status(item['id'], 'SUBMITTED', tx_id)
+            return 'SUCCESS', message, tx_id
+        self.runner.db.update_withdrawal_status(item['id'], 'FAILED', error_message=message)
+        return 'FAILED', message, None
+
+    def withdraw(self, item: Dict) -> Tuple[str, str, Optional[str]]:
+        """向交易所提交一个条目并更新其状态"""
+        try:
+            success, message, tx_id = self.binance_client.withdraw(**self._withdraw_args(item))
+        except Exception as e:
+            success, message, tx_id = False, f"地址 {item['address']} 提币失败: {str(e)}", None
+        return self._apply(item, success, message, tx_id)
+
+    async def withdraw_async(self, async_client, item: Dict) -> Tuple[str, str, Optional[str]]:
+        """通过异步客户端提交一个条目并更新其状态"""
+        try:
+            success, message, tx_id = await async_client.withdraw(**self._withdraw_args(item))
+        except Exception as e:
+            success, message, tx_id = False, f"地址 {item['address']} 提币失败: {str(e)}", None
+        return self._apply(item, success, message, tx_id)
+
+    def submit(self, item: Dict) -> Tuple[str, str, Optional[str]]:
+        """处理一个条目，已有结果的条目不重复提交"""
+        result = self.settled(item)
+        return result if result is not None else self.withdraw(item)
+
+    async def submit_async(self, async_client, item: Dict) -> Tuple[str, str, Optional[str]]:
+        """处理一个条目(异步客户端)，已有结果的条目不重复提交"""
+        result = self.settled(item)
+        return result if result is not None else await self.withdraw_async(async_client, item)
+
+    def record(self, item: Dict, result: Tuple[str, str, Optional[str]]):
+        """记录条目结果，更新计数和执行位置并推送进度"""
+        status, message, tx_id = result
+        self.counts['completed' if status == 'SUCCESS' else 'failed'] += 1
+        self.runner.db.update_batch_progress(self.task_id, self.counts['completed'], self.counts['failed'],
+                                             item['item_index'] + 1)
+        self.runner._emit(self.kind['progress'], {
+            'task_id': self.task_id,
+            'current': item['item_index'] + 1,
+            'total': self.task['total'],
+            'completed': self.counts['completed'],
+            'failed': self.counts['failed'],
+            'address': item['address'],
+            'amount': item['amount'],
+            'status': status,
+            'message': message,
+            'tx_id': tx_id
+        })
+
+    def unprocessed(self) -> int:
+        """尚未处理的条目数"""
+        return sum(1 for item in self.remaining[self.position:] if item['status'] == 'PENDING')
+
+
+class BatchTaskRunner:
+    """可恢复的批量提币任务
+
+    任务和全部条目在创建时写入数据库，每处理完一个条目记录计数和执行位置(checkpoint)，
+    两者与条目状态经同一个延迟写入队列落盘。进程重启后，仍为PROCESSING的任务从checkpoint
+    继续：之后已有结果的条目直接计入，仍为PENDING的条目可能在中断前已经提交，先按客户端
+    提币ID与交易所提币历史比对，已存在的记为已提交，其余才重新提交。
+
+    智能提币不占用线程等待间隔：每处理完一个条目，把下一步按随机间隔交给定时调度器，
+    两步之间可以暂停、继续或取消。
+    """
+
+    def __init__(self, db, executor: BoundedExecutor, scheduler: TimerScheduler,
+                 emit: Callable[[str, Dict], None] = None):
+        """
+        Args:
+            db: DatabaseManager实例
+            executor: 执行任务的后台执行器
+            scheduler: 调度智能提币各步骤的定时调度器
+            emit: 推送事件的回调(事件名, 数据)
+        """
+        self.db = db
+        self.executor = executor
+        self.scheduler = scheduler
+        self.emit = emit
+        self.window = Config.HISTORY_SYNC_WINDOW_DAYS * DAY_MS - 1
+        self.page_size = Config.HISTORY_SYNC_PAGE_SIZE
+        self._smart: Dict[str, TaskExecution] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _emit(self, event: Optional[str], data: Dict):
+        if self.emit and event:
+            self.emit(event, data)
+
+    def create(self, task_type: str, coin: str, network: str, items: List[Dict],
+               params: Dict = None) -> str:
+        """
+        创建任务并登记全部条目
+
+        Args:
+            task_type: 任务类型(BATCH/SMART)
+            coin: 币种
+            network: 网络
+            items: 条目列表，每项包含address, amount, address_tag, withdraw_order_id
+            params: 执行参数，BATCH为concurrency，SMART为min_interval/max_interval
+
+        Returns:
+            任务ID
+        """
+        task_id = str(uuid.uuid4())[:8]
+        self.db.create_batch_task(task_id, task_type, coin, network, items, params)
+        return task_id
+
+    def submit(self, binance_client, task_type: str, coin: str, network: str, items: List[Dict],
+               params: Dict = None) -> Optional[str]:
+        """
+        创建任务并放入执行器排队，参数同create
+
+        Returns:
+            任务ID，执行器已满时返回None(不创建任务)
+        """
+        if not self.executor.reserve():
+            return None
+        try:
+            task_id = self.create(task_type, coin, network, items, params)
+        except Exception:
+            self.executor.release()
+            raise
+        self.executor.submit_reserved(self.run, binance_client, task_id)
+        return task_id
+
+    def resume(self, binance_client) -> List[str]:
+        """恢复进程退出时被中断的任务，返回恢复的任务ID"""
+        task_ids = []
+        for task in self.db.get_unfinished_batch_tasks():
+            self.logger.info(f"恢复中断的任务: {task['id']}, 从第{task['checkpoint'] + 1}项继续")
+            # 中断的任务此前已被接受，不受排队上限限制
+            self.executor.reserve(force=True)
+            self.executor.submit_reserved(self.run, binance_client, task['id'], True)
+            task_ids.append(task['id'])
+        return task_ids
+
+    def _find_submitted(self, binance_client, task: Dict, items: List[Dict]) -> Dict[str, Dict]:
+        """查询交易所中已存在的提币，返回 客户端提币ID -> 提币记录"""
+        order_ids = {item['withdraw_order_id'] for item in items
+                     if item['status'] == 'PENDING' and item['withdraw_order_id']}
+        if not order_ids:
+            return {}
+        start = parse_apply_time(task['created_at']) - Config.HISTORY_SYNC_OVERLAP * 1000
+        history = fetch_history(binance_client, task['coin'], max(start, 0), int(time.time() * 1000),
+                                self.window, self.page_size)
+        return {item['withdrawOrderId']: item for item in history if item.get('withdrawOrderId') in order_ids}
+
+    def _load(self, binance_client, task_id: str) -> Optional[TaskExecution]:
+        task = self.db.get_batch_task(task_id)
+        if task is None:
+            self.logger.error(f"任务不存在: {task_id}")
+            return None
+        return TaskExecution(self, binance_client, task, self.db.get_batch_items(task_id))
+
+    def run(self, binance_client, task_id: str, resumed: bool = False):
+        """执行(或恢复执行)任务；批量任务处理完全部条目后返回，智能任务安排好第一步后即返回"""
+        execution = self._load(binance_client, task_id)
+        if execution is None:
+            return
+        task, kind = execution.task, execution.kind
+        label = kind['label']
+
+        if resumed:
+            try:
+                execution.submitted = self._find_submitted(binance_client, task, execution.remaining)
+            except Exception as e:
+                # 无法确认哪些条目已经提交时不继续执行，保持PROCESSING等待下次恢复
+                error_msg = f'{label}恢复失败，无法查询提币历史: {str(e)}'
+                self.logger.error(f"{error_msg} (任务ID: {task_id})")
+                self.db.add_operation_log(f'{label}错误', f'任务ID: {task_id}, 错误: {error_msg}', 'ERROR')
+                self._emit(kind['error'], {'task_id': task_id, 'message': error_msg})
+                return
+
+        try:
+            if resumed:
+                self.db.add_operation_log(f'{label}恢复', f'任务ID: {task_id}, 从第{task["checkpoint"] + 1}项继续')
+                message = f'恢复{label}，从第{task["checkpoint"] + 1}个地址继续'
+            else:
+                self.db.add_operation_log(f'{label}开始', f'任务ID: {task_id}, 总数: {task["total"]}')
+                message = f'开始{label}，共{task["total"]}个地址'
+            # 批量任务可改用异步客户端，在异步适配器的事件循环中并发提交
+            use_async = task['task_type'] == 'BATCH' and Config.BATCH_ASYNC
+            # 整个任务共用一份余额快照，成功后本地扣减
+            if use_async:
+                bridge = get_bridge()
+                async_client = bridge.create_client(binance_client.api_key, binance_client.api_secret,
+                                                    binance_client.testnet)
+                execution.balance = bridge.run(async_client.balance_snapshot(task['coin']))
+            else:
+                execution.balance = binance_client.balance_snapshot(task['coin'])
+            self._emit(kind['start'], {'task_id': task_id, 'status': 'PROCESSING', 'total': task['total'],
+                                       'message': message})
+
+            if task['task_type'] == 'SMART':
+                if not execution.remaining:
+                    self._finish(execution)
+                    return
+                with self._lock:
+                    self._smart[task_id] = execution
+                with execution.lock:
+                    self._schedule(execution, 0)
+                return
+
+            def report(i, item, result, error):
+                # 引擎按条目顺序串行回调，计数器、执行位置与进度事件保持一致
+                execution.record(item, result or ('FAILED', f"地址 {item['address']} 提币失败: {str(error)}", None))
+
+            # 请求节奏由客户端内置的限频调度器控制，无需固定延迟
+            if use_async:
+                engine = AsyncBatchWithdrawalEngine(task['params'].get('concurrency'))
+                engine.run(execution.remaining, lambda i, item: execution.submit_async(async_client, item), report,
+                           network=task['network'], bridge=bridge)
+            else:
+                engine = BatchWithdrawalEngine(task['params'].get('concurrency'))
+                engine.run(execution.remaining, lambda i, item: execution.submit(item), report,
+                           network=task['network'])
+            self._finish(execution)
+
+        except Exception as e:
+            self._fail(execution, e)
+
+    def _schedule(self, execution: TaskExecution, delay: float):
+        """安排智能任务的下一步(调用方持有execution.lock)"""
+        execution.state = 'scheduled'
+        execution.due = time.monotonic() + delay
+        execution.handle = self.scheduler.schedule(delay, self._step, execution)
+
+    def _step(self, execution: TaskExecution):
+        """处理智能任务的一个条目，并按随机间隔安排下一步"""
+        with execution.lock:
+            if execution.state != 'scheduled':
+                return
+            execution.state = 'running'
+
+        try:
+            item = execution.remaining[execution.position]
+            result = execution.settled(item)
+            submitted = result is None
+            if submitted:
+                result = execution.withdraw(item)
+            execution.record(item, result)
+            execution.position += 1
+        except Exception as e:
+            self._fail(execution, e)
+            return
+
+        if execution.position >= len(execution.remaining):
+            with execution.lock:
+                execution.state = 'done'
+                self._finish(execution)
+            return
+
+        # 只有实际提交了提币才等待随机间隔，恢复时已有结果的条目不需要等待
+        delay = 0
+        if submitted:
+            params = execution.task['params']
+            delay = random.randint(params.get('min_interval', 1), params.get('max_interval', 5))
+
+        with execution.lock:
+            requested, execution.requested = execution.requested, None
+            if requested == 'cancel':
+                execution.state = 'cancelled'
+                self._finish(execution, cancelled=True)
+            elif requested == 'pause':
+                execution.state = 'paused'
+                execution.delay = delay
+            else:
+                self._schedule(execution, delay)
+        if requested is None and delay:
+            self._emit(execution.kind['waiting'], {
+                'task_id': execution.task_id,
+                'next_in': delay,
+                'message': f'等待 {delay} 秒后处理下一个地址...'
+            })
+
+    def _finish(self, execution: TaskExecution, cancelled: bool = False):
+        """记录任务结束(完成或取消)并推送最终汇总"""
+        with self._lock:
+            self._smart.pop(execution.task_id, None)
+        label = execution.kind['label']
+        completed, failed = execution.counts['completed'], execution.counts['failed']
+        if cancelled:
+            skipped = execution.unprocessed()
+            # 与条目状态经同一个写入队列，已提交条目的状态更新先于取消落盘
+            self.db.cancel_batch_items(execution.task_id)
+            self.db.set_batch_task_status(execution.task_id, 'CANCELLED')
+            self.db.add_operation_log(
+                f'{label}取消',
+                f'任务ID: {execution.task_id}, 成功: {completed}, 失败: {failed}, 取消: {skipped}'
+            )
+            self._emit(execution.kind['complete'], {
+                'task_id': execution.task_id,
+                'status': 'CANCELLED',
+                'completed': completed,
+                'failed': failed,
+                'cancelled': skipped,
+                'message': f'{label}已取消: 成功{completed}个，失败{failed}个，取消{skipped}个'
+            })
+            return
+
+        self.db.set_batch_task_status(execution.task_id, 'COMPLETED')
+        self.db.add_operation_log(f'{label}完成', f'任务ID: {execution.task_id}, 成功: {completed}, 失败: {failed}')
+        self._emit(execution.kind['complete'], {
+            'task_id': execution.task_id,
+            'status': 'COMPLETED',
+            'completed': completed,
+            'failed': failed,
+            'message': f'{label}完成: 成功{completed}个，失败{failed}个'
+        })
+
+    def _fail(self, execution: TaskExecution, error: Exception):
+        """记录任务执行异常"""
+        with self._lock:
+            self._smart.pop(execution.task_id, None)
+        label = execution.kind['label']
+        error_msg = f'{label}执行异常: {str(error)}'
+        self.db.set_batch_task_status(execution.task_id, 'FAILED', error_msg)
+        self.db.add_operation_log(f'{label}错误', f'任务ID: {execution.task_id}, 错误: {error_msg}', 'ERROR')
+        self._emit(execution.kind['error'], {'task_id': execution.task_id, 'message': error_msg})
+
+    def _active(self, task_id: str) -> Optional[TaskExecution]:
+        with self._lock:
+            return self._smart.get(task_id)
+
+    def pause(self, task_id: str) -> Tuple[bool, str]:
+        """暂停智能任务，正在处理的条目完成后生效"""
+        execution = self._active(task_id)
+        if execution is None:
+            return False, '任务不在执行中'
+        with execution.lock:
+            if execution.state == 'scheduled':
+                self.scheduler.cancel(execution.handle)
+                execution.delay = max(0.0, execution.due - time.monotonic())
+                execution.state = 'paused'
+            elif execution.state == 'running' and execution.requested is None:
+                execution.requested = 'pause'
+            else:
+                return False, '任务已暂停或已结束'
+            # 在锁内写入状态，不会覆盖同时结束的任务的最终状态
+            self.db.set_batch_task_status(task_id, 'PAUSED')
+        self.db.add_operation_log(f'{execution.kind["label"]}暂停', f'任务ID: {task_id}')
+        self._emit(execution.kind['paused'], {'task_id': task_id, 'message': '任务已暂停'})
+        return True, '任务已暂停'
+
+    def resume_task(self, binance_client, task_id: str) -> Tuple[bool, str]:
+        """继续已暂停的智能任务，暂停前剩余的等待时间保持不变"""
+        execution = self._active(task_id)
+        if execution is None:
+            # 进程重启前暂停的任务，从checkpoint重新加载执行；
+            # 状态按条件原子更新，并发的继续/取消请求中只有一个生效，任务不会被执行两次
+            if binance_client is None:
+                return False, '请先配置API'
+            if not self.db.transition_batch_task(task_id, 'PAUSED', 'PROCESSING'):
+                return False, '任务未暂停'
+            self.executor.reserve(force=True)
+            self.executor.submit_reserved(self.run, binance_client, task_id, True)
+            return True, '任务已继续'
+
+        with execution.lock:
+            if execution.state == 'paused':
+                self._schedule(execution, execution.delay)
+            elif execution.requested == 'pause':
+                execution.requested = None
+            else:
+                return False, '任务未暂停'
+            self.db.set_batch_task_status(task_id, 'PROCESSING')
+        self.db.add_operation_log(f'{execution.kind["label"]}继续', f'任务ID: {task_id}')
+        self._emit(execution.kind['resumed'], {'task_id': task_id, 'message': '任务已继续'})
+        return True, '任务已继续'
+
+    def cancel(self, task_id: str) -> Tuple[bool, str]:
+        """取消智能任务，未处理的条目记为CANCELLED"""
+        execution = self._active(task_id)
+        if execution is None:
+            # 进程重启前暂停的任务，按数据库中的执行位置直接取消
+            if not self.db.transition_batch_task(task_id, 'PAUSED', 'CANCELLED'):
+                return False, '任务不在执行中'
+            self._finish(self._load(None, task_id), cancelled=True)
+            return True, '任务已取消'
+
+        with execution.lock:
+            if execution.state == 'scheduled':
+                self.scheduler.cancel(execution.handle)
+            elif execution.state == 'running':
+                execution.requested = 'cancel'
+                return True, '任务将在当前地址处理完成后取消'
+            elif execution.state != 'paused':
+                return False, '任务已结束'
+            execution.state = 'cancelled'
+            self._finish(execution, cancelled=True)
+        return True, '任务已取消'
+
+    def get_stats(self) -> Dict:
+        """获取执行中的智能任务数量(按调度状态)"""
+        with self._lock:
+            executions = list(self._smart.values())
+        states: Dict[str, int] = {}
+        for execution in executions:
+            states[execution.state] = states.get(execution.state, 0) + 1
+        return {'smart_tasks': len(executions), 'states': states}
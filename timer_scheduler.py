@@ -0,0 +1,92 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from config import Config
+
+
+class TimerScheduler:
+    """定时任务调度器
+
+    所有延时任务按到期时间放在一个最小堆中，由一个计时线程等待最早到期的任务，到期后交给
+    固定大小的线程池执行。等待期间不占用线程，大量间隔执行的任务只需要少量线程。
+    """
+
+    def __init__(self, workers: int = None):
+        """
+        Args:
+            workers: 执行到期任务的线程数
+        """
+        self.workers = workers or Config.SCHEDULER_WORKERS
+        self.stats = {'scheduled': 0, 'cancelled': 0, 'executed': 0, 'failed': 0}
+        self._heap = []
+        self._pending: Dict[int, float] = {}
+        self._seq = itertools.count(1)
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='timer-task')
+        self.logger = logging.getLogger(__name__)
+        self._thread = threading.Thread(target=self._run, name='timer-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def schedule(self, delay: float, fn: Callable, *args: Any) -> int:
+        """
+        delay秒后执行fn(*args)
+
+        Returns:
+            任务句柄，用于取消
+        """
+        due = time.monotonic() + max(0.0, delay)
+        with self._cond:
+            handle = next(self._seq)
+            heapq.heappush(self._heap, (due, handle, fn, args))
+            self._pending[handle] = due
+            self.stats['scheduled'] += 1
+            self._cond.notify()
+        return handle
+
+    def cancel(self, handle: int) -> bool:
+        """取消尚未开始执行的任务，返回是否取消成功"""
+        with self._cond:
+            if self._pending.pop(handle, None) is None:
+                return False
+            self.stats['cancelled'] += 1
+            return True
+
+    def _call(self, fn: Callable, args: tuple):
+        try:
+            fn(*args)
+        except Exception as e:
+            self.logger.error(f"定时任务执行异常: {str(e)}")
+            with self._cond:
+                self.stats['failed'] += 1
+        else:
+            with self._cond:
+                self.stats['executed'] += 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    # 已取消的任务在到达堆顶时丢弃
+                    while self._heap and self._heap[0][1] not in self._pending:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    remaining = self._heap[0][0] - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                _, handle, fn, args = heapq.heappop(self._heap)
+                del self._pending[handle]
+            self._pool.submit(self._call, fn, args)
+
+    def get_stats(self) -> Dict:
+        """获取调度统计"""
+        with self._cond:
+            return {**self.stats, 'name': 'timer', 'workers': self.workers, 'pending': len(self._pending)}